@@ -1,27 +1,42 @@
 # third-party imports
+import click
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_bootstrap import Bootstrap
 from flask_mail import Mail
 
 # local imports
 from config import app_config
+from .fragments import FragmentCacheExtension
+from .hashing import PasswordHasher
+from .instrumentation import SQLInstrumentation
+from .mailer import MailDispatcher
+from .routing import RoutingSQLAlchemy
+from .startup import StartupTimer
 from flask_login import LoginManager
 
 # db variable initialization
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 
 # after the db variable initialization
 login_manager = LoginManager()
 
 mail = Mail()
 
+mailer = MailDispatcher()
+
+instrumentation = SQLInstrumentation()
+
+passwords = PasswordHasher()
+
 def create_app(config_name):
+	startup = StartupTimer()
 	app = Flask(__name__, instance_relative_config=True)
 	app.config.from_object(app_config[config_name])
 	app.config.from_pyfile('config.py')
+	app.extensions['startup_timer'] = startup
+	startup.mark('config')
 	db.init_app(app)
+	startup.mark('sqlalchemy')
 
 	# @app.route('/')
 	# def hello_world():
@@ -30,22 +45,57 @@ def create_app(config_name):
 	login_manager.init_app(app)
 	login_manager.login_message = "You must be logged in to access this page."
 	login_manager.login_view = "auth.login"
+	startup.mark('login')
 
-	migrate = Migrate(app, db)
+	# alembic is slow to import and only the flask db commands need it
+	if click.get_current_context(silent=True) is not None:
+		from flask_migrate import Migrate
+		# SQLite can only change columns and constraints by copying the table
+		Migrate(app, db, render_as_batch=True)
+		startup.mark('migrate')
 
 	Bootstrap(app)
+	startup.mark('bootstrap')
+
+	app.jinja_env.add_extension(FragmentCacheExtension)
 
 	mail.init_app(app)
+	mailer.init_app(app)
+	startup.mark('mail')
+
+	instrumentation.init_app(app)
+
+	passwords.init_app(app)
 
 	from app import models
+	startup.mark('models')
 
 	from .admin import admin as admin_blueprint
 	app.register_blueprint(admin_blueprint, url_prefix='/admin')
+	startup.mark('admin blueprint')
 
 	from .auth import auth as auth_blueprint
 	app.register_blueprint(auth_blueprint)
+	startup.mark('auth blueprint')
 
 	from .home import home as home_blueprint
 	app.register_blueprint(home_blueprint)
+	startup.mark('home blueprint')
+
+	from .api import api as api_blueprint
+	app.register_blueprint(api_blueprint, url_prefix='/api')
+	startup.mark('api blueprint')
+
+	from .commands import inventory, startup_profile
+	app.cli.add_command(inventory)
+	app.cli.add_command(startup_profile)
+	startup.mark('commands')
+
+	from .maintenance import RepairScheduler
+	RepairScheduler(app)
+
+	from .archive import ArchiveScheduler
+	ArchiveScheduler(app)
+	startup.mark('schedulers')
 
 	return app
\ No newline at end of file
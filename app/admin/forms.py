@@ -1,10 +1,11 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired
 from wtforms import StringField, SubmitField, IntegerField
 from wtforms.validators import DataRequired
 from wtforms.fields.html5 import DateField
-from wtforms.ext.sqlalchemy.fields import QuerySelectField
 from wtforms.fields import SelectField
 
+from ..choices import CachedSelectField
 from ..models import Item, Unit, Shelf, Container
 from ..validators import AfterDate
 
@@ -14,7 +15,7 @@ class ItemForm(FlaskForm):
     """
     name = StringField('Name', validators=[DataRequired()])
     description = StringField('Description', validators=[DataRequired()])
-    unit = QuerySelectField(query_factory=lambda: Unit.query.all(), get_label="name")
+    unit = CachedSelectField(model=Unit)
     quantity = IntegerField('Quantity', validators=[DataRequired()])
     submit = SubmitField('Submit')
 
@@ -36,7 +37,7 @@ class ReservationAddForm(ReservationForm):
     """
     hasItem = False
 
-    item = QuerySelectField(query_factory=lambda: Item.query.all(), get_label="name")
+    item = CachedSelectField(model=Item)
     submit = SubmitField('Submit')
 
 class ReservationAddForItemForm(ReservationForm):
@@ -65,7 +66,7 @@ class AssignUnitForm(FlaskForm):
     """
     Form for admin to add or edit a department
     """
-    unit = QuerySelectField(query_factory=lambda: Unit.query.all(), get_label="name")
+    unit = CachedSelectField(model=Unit)
     submit = SubmitField('Submit')
 
 class ShelfContainerForm(FlaskForm):
@@ -76,7 +77,7 @@ class ShelfContainerForm(FlaskForm):
     submit = SubmitField('Submit')
 
 class ShelfContainerLocationUnknownForm(ShelfContainerForm):
-    unit = QuerySelectField(query_factory=lambda: Unit.query.all(), get_label="name")
+    unit = CachedSelectField(model=Unit)
     submit = SubmitField('Submit')
 
 class AssignShelfForm(FlaskForm):
@@ -90,6 +91,13 @@ class AssignContainerForm(FlaskForm):
     """
     Form for admin to add or edit a department
     """
-    container = QuerySelectField(query_factory=lambda: Container.query.all(), get_label="name")
+    container = CachedSelectField(model=Container)
     submit = SubmitField('Submit')
 
+class ImportForm(FlaskForm):
+    """
+    Form for admin to import items from a file
+    """
+    file = FileField('File', validators=[FileRequired()])
+    format = SelectField('Format', choices=[('csv', 'CSV'), ('jsonl', 'JSON lines')])
+    submit = SubmitField('Import')
@@ -1,11 +1,29 @@
-from flask import abort, flash, redirect, render_template, url_for
+import io
+
+from flask import abort, current_app, flash, redirect, render_template, request, Response, stream_with_context, url_for
 from flask_login import current_user, login_required
 from flask_mail import Message
 
 from . import admin
 from .forms import *
-from .. import db, mail
-from ..models import Item, Reservation, Brother, Unit, Shelf, Unit, Container
+from .. import db, instrumentation, mailer
+from ..cascade import delete_cascade
+from ..conflicts import conflicting_reservations, find_conflicts
+from ..fragments import fragment_cache
+from ..listings import item_listing, reservation_count_map, ITEM_SORTS, RESERVATION_SORTS, ARCHIVE_SORTS, BROTHER_SORTS, UNIT_SORTS, CONTAINER_SORTS
+from ..locations import location_tree
+from ..pagination import paginate
+from ..transfer import EXPORTS, FORMATS, export, import_items, read
+from ..users import user_cache
+from ..models import ArchivedReservation, Item, Reservation, Brother, Unit, Shelf, Unit, Container
+
+def notify(brother, subject, html):
+	"""
+	Email a brother about a change made by an admin. Notifications are
+	coalesced into a digest when MAIL_DIGEST_WINDOW is set.
+	"""
+	msg = Message(html=html, sender='alphagammawebmaster@gmail.com', subject=subject, recipients=[brother.email])
+	mailer.send(msg, coalesce=True)
 
 def check_admin():
 	"""
@@ -27,37 +45,20 @@ def list_items(type_code=-1, object_id=None):
 
 	shelf = Shelf()
 	unit = Unit()
-	if type_code == -1:
-		items = Item.query.all()
-	elif type_code == 0:
-		items = Item.query.filter_by(shelf_id=object_id).all()
+	filters = {}
+	if type_code == 0:
+		filters = {'shelf_id': object_id}
 		shelf = Shelf.query.get(object_id)
 		unit = Unit.query.filter_by(id=shelf.unit_id).first()
 	elif type_code == 1:
 		#item_id is 0 and brother_id is not
-		items = Item.query.filter_by(unit_id=object_id).all()
+		filters = {'unit_id': object_id}
 		unit = Unit.query.get(object_id)
 
-	for item in items:
-		if item.shelf is not None and item.unit is None:
-			if shelf.unit is None:
-				item.shelf_id = None
-				db.session.delete(item.shelf)
-			item.unit_id = shelf.unit_id
-			db.session.add(item)
-			db.session.commit()
-
-		# if item.unit_id:
-		# 	item.unit = Unit.query.filter_by(id=item.unit_id).first()
-		# else:
-		# 	item.unit = None
-		# if item.shelf_id:
-		# 	item.shelf = Shelf.query.filter_by(id=item.shelf_id).first()
-		# else:
-		# 	item.shelf = None
+	page = paginate(item_listing(**filters), ITEM_SORTS, Item.id, 'name')
 
 	return render_template('admin/items/items.html',
-						   items=items, shelf=shelf, unit=unit,
+						   items=page.items, page=page, shelf=shelf, unit=unit,
 						   title="Items")
 
 @admin.route('/items/add', methods=['GET', 'POST'])
@@ -80,6 +81,7 @@ def add_item():
 			# add item to the database
 			db.session.add(item)
 			db.session.commit()
+			location_tree.invalidate()
 			flash('You have successfully added a new item.')
 		except:
 			# in case item name already exists
@@ -116,6 +118,7 @@ def edit_item(id):
 
 		db.session.add(item)
 		db.session.commit()
+		location_tree.invalidate()
 		flash('You have successfully edited the item.')
 
 		# redirect to the items page
@@ -135,9 +138,10 @@ def delete_item(id):
 	"""
 	check_admin()
 
-	item = Item.query.get_or_404(id)
-	db.session.delete(item)
+	Item.query.get_or_404(id)
+	delete_cascade(Item, [id])
 	db.session.commit()
+	location_tree.invalidate()
 	flash('You have successfully deleted the Item.')
 
 	# redirect to the items page
@@ -167,6 +171,7 @@ def assign_unit_item(item_id):
 		try:
 			db.session.add(item)
 			db.session.commit()
+			location_tree.invalidate()
 		except:
 			flash('Error: Unit was not assigned')
 
@@ -207,6 +212,7 @@ def assign_shelf_item(item_id):
 		try:
 			db.session.add(item)
 			db.session.commit()
+			location_tree.invalidate()
 		except:
 			flash('Error: Shelf was not assigned')
 
@@ -239,6 +245,7 @@ def assign_container_item(item_id):
 		try:
 			db.session.add(item)
 			db.session.commit()
+			location_tree.invalidate()
 		except:
 			flash('Error: Container was not assigned')
 
@@ -260,18 +267,48 @@ def list_reservations(type_code=-1, object_id=0):
 
 	item = Item()
 	brother = Brother()
-	if type_code == -1:
-		reservations = Reservation.query.all()
-	elif type_code == 0:
-		reservations = Reservation.query.filter_by(item_id=object_id).all()
+	conflicts = request.args.get('filter') == 'conflicts'
+	reservations = Reservation.query
+	if conflicts:
+		reservations = conflicting_reservations(reservations)
+	if type_code == 0:
+		reservations = reservations.filter_by(item_id=object_id)
 		item = Item.query.get(object_id)
 	elif type_code == 1:
 		#item_id is 0 and brother_id is not
-		reservations = Reservation.query.filter_by(brother_id=object_id).all()
+		reservations = reservations.filter_by(brother_id=object_id)
 		brother = Brother.query.get(object_id)
 
+	page = paginate(reservations, RESERVATION_SORTS, Reservation.id, 'date')
+
 	return render_template('admin/reservations/reservations.html',
-						   reservations=reservations, title='Reservations', item=item, brother=brother)
+						   reservations=page.items, page=page, conflicts=conflicts,
+						   title='Reservations', item=item, brother=brother)
+
+@admin.route('/reservations/history')
+@admin.route('/reservations/history/<int:type_code>/<int:object_id>')
+@login_required
+def reservation_history(type_code=-1, object_id=0):
+	"""
+	List the reservations that were moved to the archive
+	"""
+	check_admin()
+
+	item = Item()
+	brother = Brother()
+	reservations = ArchivedReservation.query
+	if type_code == 0:
+		reservations = reservations.filter_by(item_id=object_id)
+		item = Item.query.get(object_id)
+	elif type_code == 1:
+		reservations = reservations.filter_by(brother_id=object_id)
+		brother = Brother.query.get(object_id)
+
+	page = paginate(reservations, ARCHIVE_SORTS, ArchivedReservation.id, 'date')
+
+	return render_template('admin/reservations/history.html',
+						   reservations=page.items, page=page,
+						   title='Reservation History', item=item, brother=brother)
 
 @admin.route('/reservation/add', methods=['GET', 'POST'])
 @admin.route('/reservation/add/<int:item_id>', methods=['GET', 'POST'])
@@ -291,25 +328,35 @@ def add_reservation(item_id=0):
 		form.item = Item.query.get(item_id)
 
 	if form.validate_on_submit():
-		reservation = Reservation(reason=form.reason.data,
-					fromDate=form.fromDate.data,
-					toDate=form.toDate.data,
-					reserved_by=current_user.first_name + ' ' + current_user.last_name,
-					item_name=form.item.data.name,
-					item_id=form.item.data.id,
-					brother_id=current_user.id)
-
-		try:
-			# add reservation to the database
-			db.session.add(reservation)
-			db.session.commit()
-			flash('You have successfully added a new reservation for the %s.' % form.item.data.name)
-		except:
-			# in case reservation name already exists
-			flash('Error: reservation name already exists.')
-
-		# redirect to the reservations page
-		return redirect(url_for('admin.list_reservations'))
+		if item_id == 0:
+			item = form.item.data
+		else:
+			item = form.item
+
+		if item.stock == 0:
+			flash('Error: the %s has a quantity of 0 and cannot be reserved.' % item.name, 'danger')
+		elif find_conflicts(item, form.fromDate.data, form.toDate.data):
+			flash('Error: the %s is already fully reserved on some of those dates.' % item.name, 'danger')
+		else:
+			reservation = Reservation(reason=form.reason.data,
+						fromDate=form.fromDate.data,
+						toDate=form.toDate.data,
+						reserved_by=current_user.first_name + ' ' + current_user.last_name,
+						item_name=item.name,
+						item_id=item.id,
+						brother_id=current_user.id)
+
+			try:
+				# add reservation to the database
+				db.session.add(reservation)
+				db.session.commit()
+				flash('You have successfully added a new reservation for the %s.' % item.name)
+			except:
+				# in case reservation name already exists
+				flash('Error: reservation name already exists.')
+
+			# redirect to the reservations page
+			return redirect(url_for('admin.list_reservations'))
 
 	# load reservation template
 	return render_template('admin/reservations/reservation.html', add_reservation=add_reservation,
@@ -329,15 +376,20 @@ def edit_reservation(id):
 	form = ReservationEditForm(obj=reservation)
 	form.item = reservation.item
 	if form.validate_on_submit():
-		reservation.reason = form.reason.data
-		reservation.fromDate = form.fromDate.data
-		reservation.toDate = form.toDate.data
-		db.session.add(reservation)
-		db.session.commit()
-		flash('You have successfully edited the reservation.')
+		if reservation.item.stock == 0:
+			flash('Error: the %s has a quantity of 0 and cannot be reserved.' % reservation.item.name, 'danger')
+		elif find_conflicts(reservation.item, form.fromDate.data, form.toDate.data, exclude_id=reservation.id):
+			flash('Error: the %s is already fully reserved on some of those dates.' % reservation.item.name, 'danger')
+		else:
+			reservation.reason = form.reason.data
+			reservation.fromDate = form.fromDate.data
+			reservation.toDate = form.toDate.data
+			db.session.add(reservation)
+			db.session.commit()
+			flash('You have successfully edited the reservation.')
 
-		# redirect to the reservations page
-		return redirect(url_for('admin.list_reservations'))
+			# redirect to the reservations page
+			return redirect(url_for('admin.list_reservations'))
 
 	form.reason.data = reservation.reason
 	form.fromDate.data = reservation.fromDate
@@ -364,8 +416,7 @@ def approve_reservation(id, item=None):
 	html = '<p>Your reservation for the %s has been approved.</p>' % Item.query.get(reservation.item_id).name
 
 	brother = Brother.query.get(reservation.brother_id)
-	msg = Message(html=html, sender='alphagammawebmaster@gmail.com', subject='Your Reservation for %s' % reservation.item.name, recipients=[brother.email])
-	mail.send(msg)
+	notify(brother, 'Your Reservation for %s' % reservation.item.name, html)
 
 	flash(toFlash)
 
@@ -393,8 +444,7 @@ def revoke_reservation(id, item=None):
 	html = '<p>Your reservation for the %s has been revoked.</p>' % Item.query.get(reservation.item_id).name
 
 	brother = Brother.query.filter_by(id=reservation.brother_id).first()
-	msg = Message(html=html, sender='alphagammawebmaster@gmail.com', subject='Your Reservation for %s' % reservation.item.name, recipients=[brother.email])
-	mail.send(msg)
+	notify(brother, 'Your Reservation for %s' % reservation.item.name, html)
 
 	flash(toFlash)
 
@@ -429,9 +479,9 @@ def list_brothers():
 	"""
 	check_admin()
 
-	brothers = Brother.query.all()
+	page = paginate(Brother.query, BROTHER_SORTS, Brother.id, 'name')
 	return render_template('admin/brothers/brothers.html',
-						   brothers=brothers, title='Brothers', current_user=current_user)
+						   brothers=page.items, page=page, title='Brothers', current_user=current_user)
 
 @admin.route('/brothers/GrantAdmin/<int:id>', methods=['GET', 'POST'])
 @login_required
@@ -445,13 +495,13 @@ def grant_admin(id):
 	brother.is_admin = True
 	db.session.add(brother)
 	db.session.commit()
+	user_cache.invalidate(brother.id)
 
 
 	toFlash = 'You have successfully granted admin access to %s. They have been sent an email.' % brother.first_name
 	html = '<p>You have been made an admin on Alpha Gamma\'s Inventory website</p>'
 
-	msg = Message(html=html, sender='alphagammawebmaster@gmail.com', subject='Admin status for Alpha Gamma Inventory', recipients=[brother.email])
-	mail.send(msg)
+	notify(brother, 'Admin status for Alpha Gamma Inventory', html)
 
 	flash(toFlash)
 
@@ -469,13 +519,13 @@ def revoke_admin(id):
 	brother.is_admin = False
 	db.session.add(brother)
 	db.session.commit()
+	user_cache.invalidate(brother.id)
 
 
 	toFlash = 'You have successfully revoked admin access from %s. They have been sent an email.' % brother.first_name
 	html = '<p>You have been removed as an admin on Alpha Gamma\'s Inventory website</p>'
 
-	msg = Message(html=html, sender='alphagammawebmaster@gmail.com', subject='Admin status for Alpha Gamma Inventory', recipients=[brother.email])
-	mail.send(msg)
+	notify(brother, 'Admin status for Alpha Gamma Inventory', html)
 
 	flash(toFlash)
 
@@ -486,14 +536,11 @@ def revoke_admin(id):
 def remove_brother(id):
 	check_admin()
 
-	brother = Brother.query.get_or_404(id)
-	brother_reservations = Reservation.query.filter_by(brother_id=id).all()
-
-	db.session.delete(brother)
-	for reservation in brother_reservations:
-		db.session.delete(reservation)
-
+	Brother.query.get_or_404(id)
+	# takes the brother's reservations with them
+	delete_cascade(Brother, [id])
 	db.session.commit()
+	user_cache.invalidate(id)
 
 	flash('Brother successfully deleted')
 
@@ -507,9 +554,9 @@ def list_units():
 	"""
 	check_admin()
 
-	units = Unit.query.all()
+	page = paginate(Unit.query, UNIT_SORTS, Unit.id, 'name')
 	return render_template('admin/units/units.html',
-						   units=units, title='Units', current_user=current_user)
+						   units=page.items, page=page, title='Units', current_user=current_user)
 
 @admin.route('/units/add', methods=['GET', 'POST'])
 @login_required
@@ -524,6 +571,7 @@ def add_unit():
 			# add item to the database
 			db.session.add(unit)
 			db.session.commit()
+			location_tree.invalidate()
 			flash('You have successfully added a new unit.')
 		except:
 			# in case item name already exists
@@ -554,6 +602,7 @@ def edit_unit(id):
 		unit.location = form.location.data
 		db.session.add(unit)
 		db.session.commit()
+		location_tree.invalidate()
 		flash('You have successfully edited the unit.')
 
 		# redirect to the units page
@@ -571,9 +620,10 @@ def delete_unit(id):
 	"""
 	check_admin()
 
-	unit = Unit.query.get_or_404(id)
-	db.session.delete(unit)
+	Unit.query.get_or_404(id)
+	delete_cascade(Unit, [id])
 	db.session.commit()
+	location_tree.invalidate()
 	flash('You have successfully deleted the Unit.')
 
 	# redirect to the units page
@@ -585,9 +635,12 @@ def list_items_unit(unit_id):
 
 	check_admin()
 
-	unit = Unit.query.get_or_404(unit_id)
+	unit = location_tree.get().units.get(unit_id)
+	if unit is None:
+		abort(404)
+	counts = reservation_count_map(unit_id=unit_id)
 
-	return render_template('admin/items/items_in_unit.html', unit=unit, title="Items")
+	return render_template('admin/items/items_in_unit.html', unit=unit, counts=counts, title="Items")
 
 @admin.route('/units/shelves/<int:unit_id>', methods=['GET', 'POST'])
 @login_required
@@ -595,8 +648,10 @@ def list_shelves(unit_id):
 
 	check_admin()
 
-	unit = Unit.query.filter_by(id=unit_id).first()
-	shelves = Shelf.query.filter_by(unit_id=unit_id).all()
+	unit = location_tree.get().units.get(unit_id)
+	if unit is None:
+		abort(404)
+	shelves = unit.shelves
 
 	return render_template('admin/shelves/shelves.html',
 						   unit=unit, shelves=shelves, title='Shelves')
@@ -617,6 +672,7 @@ def add_shelf(unit_id):
 		shelf.name = form.name.data
 		db.session.add(shelf)
 		db.session.commit()
+		location_tree.invalidate()
 		flash('You have successfully added a shelf to the unit.')
 
 		# redirect to the units page
@@ -640,6 +696,7 @@ def edit_shelf(id):
 		shelf.name = form.name.data
 		db.session.add(shelf)
 		db.session.commit()
+		location_tree.invalidate()
 		flash('You have successfully edited the shelf.')
 
 		# redirect to the units page
@@ -658,8 +715,9 @@ def delete_shelf(id):
 
 	shelf = Shelf.query.get_or_404(id)
 	unit_id = shelf.unit_id
-	db.session.delete(shelf)
+	delete_cascade(Shelf, [id])
 	db.session.commit()
+	location_tree.invalidate()
 
 	# redirect to the units page
 	return redirect(url_for('admin.list_shelves', unit_id=unit_id))
@@ -673,12 +731,13 @@ def list_containers(shelf_id=None):
 
 	shelf = Shelf.query.filter_by(id=shelf_id).first()
 	if shelf_id:
-		containers = Container.query.filter_by(shelf_id=shelf_id).all()
+		containers = Container.query.filter_by(shelf_id=shelf_id)
 	else:
-		containers = Container.query.all()
+		containers = Container.query
+	page = paginate(containers, CONTAINER_SORTS, Container.id, 'name')
 
 	return render_template('admin/containers/containers.html',
-							shelf=shelf, containers=containers, title='Containers')
+							shelf=shelf, containers=page.items, page=page, title='Containers')
 
 @admin.route('/containers/add', methods=['GET', 'POST'])
 @admin.route('/containers/add/<int:shelf_id>', methods=['GET', 'POST'])
@@ -704,6 +763,7 @@ def add_container(shelf_id=None):
 			container.unit_id = form.unit.data.id
 		db.session.add(container)
 		db.session.commit()
+		location_tree.invalidate()
 		flash('You have successfully added a container.')
 
 		# redirect to the units page
@@ -727,6 +787,7 @@ def edit_container(id):
 		container.name = form.name.data
 		db.session.add(container)
 		db.session.commit()
+		location_tree.invalidate()
 		flash('You have successfully edited the cotainer.')
 
 		# redirect to the units page
@@ -743,9 +804,10 @@ def delete_container(id):
 	"""
 	check_admin()
 
-	container = Container.query.get_or_404(id)
-	db.session.delete(container)
+	Container.query.get_or_404(id)
+	delete_cascade(Container, [id])
 	db.session.commit()
+	location_tree.invalidate()
 
 	# redirect to the units page
 	return redirect(url_for('admin.list_containers'))
@@ -756,9 +818,12 @@ def list_items_container(container_id):
 
 	check_admin()
 
-	container = Container.query.get_or_404(container_id)
+	container = location_tree.get().containers.get(container_id)
+	if container is None:
+		abort(404)
+	counts = reservation_count_map(container_id=container_id)
 
-	return render_template('admin/items/items_in_container.html', container=container, title="Items")
+	return render_template('admin/items/items_in_container.html', container=container, counts=counts, title="Items")
 
 
 @admin.route('/container/remove_item/<int:item_id>', methods=['GET', 'POST'])
@@ -778,6 +843,7 @@ def remove_item(item_id):
 	try:
 		db.session.add(item)
 		db.session.commit()
+		location_tree.invalidate()
 	except:
 		flash('Error: Item was not removed.')
 
@@ -806,6 +872,7 @@ def assign_unit_container(container_id):
 		try:
 			db.session.add(container)
 			db.session.commit()
+			location_tree.invalidate()
 		except:
 			flash('Error: Unit was not assigned')
 
@@ -846,6 +913,7 @@ def assign_shelf_container(container_id):
 		try:
 			db.session.add(container)
 			db.session.commit()
+			location_tree.invalidate()
 		except:
 			flash('Error: Shelf was not assigned')
 
@@ -854,4 +922,70 @@ def assign_shelf_container(container_id):
 
 	# redirect to the items page
 	return render_template('admin/shelves/shelf.html',
-						   object=container, unit=container.unit, title='Assign Shelf', form=form)
\ No newline at end of file
+						   object=container, unit=container.unit, title='Assign Shelf', form=form)
+
+# Import and Export Views
+
+@admin.route('/transfer', methods=['GET', 'POST'])
+@login_required
+def transfer():
+	"""
+	Export tables and import items from a file
+	"""
+	check_admin()
+
+	form = ImportForm()
+	if form.validate_on_submit():
+		stream = io.TextIOWrapper(form.file.data.stream, encoding='utf-8', newline='')
+		result = import_items(read(stream, form.format.data))
+		flash('You have imported %d new items and updated %d.' % (result.created, result.updated))
+		for number, error in result.errors[:20]:
+			flash('Line %d was skipped: %s' % (number, error), 'warning')
+		if len(result.errors) > 20:
+			flash('%d more lines were skipped.' % (len(result.errors) - 20), 'warning')
+		return redirect(url_for('admin.transfer'))
+
+	return render_template('admin/transfer/transfer.html', form=form,
+						   tables=sorted(EXPORTS), formats=FORMATS, title='Import and Export')
+
+@admin.route('/export/<name>.<format>')
+@login_required
+def export_table(name, format):
+	"""
+	Stream a table as CSV or JSON lines
+	"""
+	check_admin()
+	if name not in EXPORTS or format not in FORMATS:
+		abort(404)
+
+	mimetype = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+	return Response(stream_with_context(export(name, format)), mimetype=mimetype,
+					headers={'Content-Disposition': 'attachment; filename=%s.%s' % (name, format)})
+
+# Performance Views
+
+@admin.route('/perf')
+@login_required
+def perf():
+	"""
+	List the statements run and time spent per endpoint
+	"""
+	check_admin()
+
+	endpoints = sorted(instrumentation.endpoints.values(), key=lambda stats: stats.db_time, reverse=True)
+	return render_template('admin/perf/perf.html', endpoints=endpoints, fragments=fragment_cache,
+						   threshold=current_app.config['SQL_REPEAT_WARNING'], title='Performance')
+
+@admin.route('/perf/reset', methods=['GET', 'POST'])
+@login_required
+def reset_perf():
+	"""
+	Start counting from scratch
+	"""
+	check_admin()
+
+	instrumentation.reset()
+	fragment_cache.reset_counts()
+	flash('You have successfully reset the performance counters.')
+
+	return redirect(url_for('admin.perf'))
@@ -0,0 +1,217 @@
+from flask import current_app, jsonify, request
+from flask_login import current_user, login_required
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from . import api
+from .views import api_error, BadRequest, Conflict, Forbidden, NotFound
+from .. import db
+from ..cascade import delete_cascade
+from ..counters import parents_of, recount
+from ..locations import location_tree
+from ..models import Item, Unit, Shelf, Container
+from ..search import index_changes
+from ..versions import touch
+
+class Resource(object):
+    """
+    A table the bulk API writes to, the columns clients may set and the
+    column of items that points at it, used to find the items to reindex
+    for search
+    """
+    def __init__(self, model, fields, required, indexed_by):
+        self.model = model
+        self.table = model.__table__
+        self.fields = fields
+        self.required = required
+        self.indexed_by = indexed_by
+
+    def columns(self):
+        return [self.table.c.id] + [self.table.c[name] for name in self.fields]
+
+RESOURCES = {
+    'items': Resource(Item, ('name', 'description', 'quantity', 'unit_id', 'shelf_id', 'container_id'),
+                      ('name',), 'id'),
+    'units': Resource(Unit, ('name', 'location'), ('name',), 'unit_id'),
+    'shelves': Resource(Shelf, ('name', 'unit_id'), ('name',), 'shelf_id'),
+    'containers': Resource(Container, ('name', 'unit_id', 'shelf_id'), ('name',), 'container_id'),
+}
+
+@api.errorhandler(IntegrityError)
+def integrity_error(error):
+    # nothing of a batch is kept when one of its rows breaks a constraint
+    db.session.rollback()
+    return api_error(Conflict('the batch conflicts with existing rows: %s' % error.orig))
+
+def check_admin():
+    if not current_user.is_admin:
+        raise Forbidden('only admins can use the bulk API')
+
+def read_batch():
+    """
+    Read the JSON array of the request body
+    """
+    batch = request.get_json(silent=True)
+    if not isinstance(batch, list):
+        raise BadRequest('the request body must be a JSON array')
+    if not batch:
+        raise BadRequest('the request body must not be empty')
+    if len(batch) > current_app.config['API_MAX_BATCH']:
+        raise BadRequest('at most %d objects can be sent at once' % current_app.config['API_MAX_BATCH'])
+    return batch
+
+def read_id(value, index):
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise BadRequest('object %d: id must be an integer' % index)
+    return value
+
+def validate(resource, batch, partial=False):
+    """
+    Check every object of batch against the columns of resource and return
+    them as mappings for the bulk methods of the session. With partial set
+    objects need an id and only the columns they name are changed.
+    """
+    rows = []
+    references = {}
+    for index, obj in enumerate(batch):
+        if not isinstance(obj, dict):
+            raise BadRequest('object %d must be a JSON object' % index)
+        unknown = set(obj) - set(resource.fields) - set(['id'] if partial else [])
+        if unknown:
+            raise BadRequest('object %d: unknown fields %s' % (index, ', '.join(sorted(unknown))))
+
+        row = {}
+        if partial:
+            if 'id' not in obj:
+                raise BadRequest('object %d: id is required' % index)
+            row['id'] = read_id(obj['id'], index)
+        else:
+            for name in resource.required:
+                if not obj.get(name):
+                    raise BadRequest('object %d: %s is required' % (index, name))
+
+        for name in resource.fields:
+            if name not in obj:
+                continue
+            value = obj[name]
+            column = resource.table.c[name]
+            if value is None:
+                if name in resource.required:
+                    raise BadRequest('object %d: %s must not be null' % (index, name))
+            elif column.type.python_type is int:
+                if not isinstance(value, int) or isinstance(value, bool):
+                    raise BadRequest('object %d: %s must be an integer' % (index, name))
+                for key in column.foreign_keys:
+                    references.setdefault(key.column.table, set()).add(value)
+            elif not isinstance(value, str):
+                raise BadRequest('object %d: %s must be a string' % (index, name))
+            elif column.type.length and len(value) > column.type.length:
+                raise BadRequest('object %d: %s must be at most %d characters long' % (index, name, column.type.length))
+            row[name] = value
+        rows.append(row)
+
+    # one query per referenced table instead of one per object
+    for table, ids in references.items():
+        found = set(id for id, in db.session.query(table.c.id).filter(table.c.id.in_(ids)))
+        if ids - found:
+            raise BadRequest('%s %s do not exist' % (table.name, ', '.join(str(id) for id in sorted(ids - found))))
+    return rows
+
+def check_exist(resource, ids):
+    found = set(id for id, in db.session.query(resource.table.c.id).filter(resource.table.c.id.in_(ids)))
+    if set(ids) - found:
+        raise NotFound('%s %s do not exist' % (resource.table.name,
+                                               ', '.join(str(id) for id in sorted(set(ids) - found))))
+
+def in_ids(column, ids):
+    return '%s IN (%s)' % (column, ','.join(str(int(id)) for id in ids))
+
+def commit(tables, conditions):
+    """
+    Reindex the affected items, bump the versions of the changed tables and
+    commit the batch as one transaction
+    """
+    index_changes(db.session, conditions)
+    touch(db.session, *tables)
+    db.session.commit()
+    location_tree.invalidate()
+
+def fetch(resource, ids=None):
+    query = db.session.query(*resource.columns()).order_by(resource.table.c.id)
+    if ids is not None:
+        query = query.filter(resource.table.c.id.in_(ids))
+    return [dict(zip(row.keys(), row)) for row in query]
+
+@api.route('/v1/<any(items, units, shelves, containers):name>', methods=['GET'])
+@login_required
+def bulk_list(name):
+    """
+    Every item, unit, shelf or container, or the ones given as ?ids=1,2,3
+    """
+    resource = RESOURCES[name]
+    ids = None
+    if request.args.get('ids'):
+        try:
+            ids = [int(id) for id in request.args['ids'].split(',') if id]
+        except ValueError:
+            raise BadRequest('ids must be a comma separated list of ids')
+    return jsonify({name: fetch(resource, ids)})
+
+@api.route('/v1/<any(items, units, shelves, containers):name>', methods=['POST'])
+@login_required
+def bulk_create(name):
+    """
+    Create every object of the JSON array in one transaction
+    """
+    check_admin()
+    resource = RESOURCES[name]
+    rows = validate(resource, read_batch())
+
+    # touching the table first takes the write lock, so nobody else can
+    # insert between reading the largest id and the insert
+    touch(db.session, resource.table.name)
+    last_id = db.session.query(func.max(resource.table.c.id)).scalar() or 0
+    # one executemany, which needs the same columns in every row
+    db.session.execute(resource.table.insert(),
+                       [dict((field, row.get(field)) for field in resource.fields) for row in rows])
+    ids = [id for id, in db.session.query(resource.table.c.id).filter(resource.table.c.id > last_id)]
+    recount(db.session, parents_of(db.session, resource.table, ids))
+    commit([resource.table.name], [in_ids('items.' + resource.indexed_by, ids)])
+    return jsonify({name: fetch(resource, ids)}), 201
+
+@api.route('/v1/<any(items, units, shelves, containers):name>', methods=['PATCH'])
+@login_required
+def bulk_update(name):
+    """
+    Update the objects of the JSON array, found by their id, in one
+    transaction. Fields left out of an object are not changed.
+    """
+    check_admin()
+    resource = RESOURCES[name]
+    rows = validate(resource, read_batch(), partial=True)
+    ids = [row['id'] for row in rows]
+    check_exist(resource, ids)
+
+    # objects that move are uncounted where they were and counted where they go
+    parents = parents_of(db.session, resource.table, ids)
+    db.session.bulk_update_mappings(resource.model, rows)
+    recount(db.session, parents_of(db.session, resource.table, ids, parents))
+    commit([resource.table.name], [in_ids('items.' + resource.indexed_by, ids)])
+    return jsonify({name: fetch(resource, ids)})
+
+@api.route('/v1/<any(items, units, shelves, containers):name>', methods=['DELETE'])
+@login_required
+def bulk_delete(name):
+    """
+    Delete the objects whose ids are given as a JSON array in one
+    transaction
+    """
+    check_admin()
+    resource = RESOURCES[name]
+    ids = [read_id(id, index) for index, id in enumerate(read_batch())]
+    check_exist(resource, ids)
+
+    delete_cascade(resource.model, ids)
+    db.session.commit()
+    location_tree.invalidate()
+    return jsonify(deleted=len(set(ids)))
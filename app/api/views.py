@@ -0,0 +1,95 @@
+from datetime import date, datetime, timedelta
+
+from flask import current_app, jsonify, request
+from flask_login import login_required
+
+from . import api
+from ..availability import availability
+from ..models import Item
+
+class APIError(Exception):
+    """
+    Raised by the API views to answer with a JSON error and its status
+    """
+    status = 400
+
+class BadRequest(APIError):
+    status = 400
+
+class Forbidden(APIError):
+    status = 403
+
+class NotFound(APIError):
+    status = 404
+
+class Conflict(APIError):
+    status = 409
+
+@api.errorhandler(APIError)
+def api_error(error):
+    return jsonify(error=str(error)), error.status
+
+def parse_date(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise BadRequest('%s must be a date formatted as YYYY-MM-DD' % name)
+
+def date_range():
+    """
+    Read the ?from= and ?to= range, defaulting to the next 30 days
+    """
+    start = parse_date('from', date.today())
+    end = parse_date('to', start + timedelta(days=30))
+    if end < start:
+        raise BadRequest('from must not be after to')
+    if (end - start).days >= current_app.config['AVAILABILITY_MAX_DAYS']:
+        raise BadRequest('the range can span at most %d days' % current_app.config['AVAILABILITY_MAX_DAYS'])
+    return start, end
+
+def availability_json(item, days):
+    return {
+        'item_id': item.id,
+        'name': item.name,
+        'quantity': item.quantity,
+        'days': [{'date': day.isoformat(), 'free': free} for day, free in days],
+    }
+
+@api.route('/items/<int:id>/availability')
+@login_required
+def item_availability(id):
+    """
+    Free quantity of an item on each day between ?from= and ?to=
+    """
+    item = Item.query.get_or_404(id)
+    start, end = date_range()
+
+    result = availability_json(item, availability([item], start, end)[item.id])
+    result.update({'from': start.isoformat(), 'to': end.isoformat()})
+    return jsonify(result)
+
+@api.route('/items/availability')
+@login_required
+def items_availability():
+    """
+    Free quantity of several items, given as ?ids=1,2,3, on each day
+    between ?from= and ?to=
+    """
+    try:
+        ids = [int(id) for id in request.args.get('ids', '').split(',') if id]
+    except ValueError:
+        raise BadRequest('ids must be a comma separated list of item ids')
+    if not ids:
+        raise BadRequest('ids is required')
+    start, end = date_range()
+
+    items = Item.query.filter(Item.id.in_(ids)).all()
+    free = availability(items, start, end)
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'items': [availability_json(item, free[item.id]) for item in items],
+    })
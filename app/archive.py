@@ -0,0 +1,71 @@
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import literal, select
+
+from app import db
+from .counters import parents_of, recount
+from .maintenance import Scheduler
+from .models import ArchivedReservation, Reservation
+from .versions import touch
+
+reservations = Reservation.__table__
+archive = ArchivedReservation.__table__
+
+# columns copied from a reservation into the archive
+COLUMNS = [column.name for column in reservations.columns]
+
+def horizon():
+	"""
+	Reservations that ended before this date are archived
+	"""
+	return date.today() - timedelta(days=current_app.config['RESERVATION_ARCHIVE_DAYS'])
+
+def archive_reservations(before=None, batch_size=None, dry_run=False):
+	"""
+	Move the reservations that ended before the given date, or the
+	archive horizon, into reservations_archive.
+
+	Every batch of batch_size reservations is copied with one INSERT ...
+	SELECT and removed with one DELETE in its own transaction, so the
+	table is never locked for long. Return the number of reservations
+	moved, or that would be moved with dry_run.
+	"""
+	before = before or horizon()
+	batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+	old = reservations.c.toDate < before
+
+	if dry_run:
+		return db.session.query(Reservation).filter(old).count()
+
+	moved = 0
+	while True:
+		ids = [id for id, in db.session.execute(
+			select([reservations.c.id]).where(old).order_by(reservations.c.id).limit(batch_size))]
+		if not ids:
+			break
+
+		copied = select([reservations.c[name] for name in COLUMNS] +
+						[literal(datetime.now(), archive.c.archived_at.type)]) \
+			.where(reservations.c.id.in_(ids))
+		db.session.execute(archive.insert().from_select(COLUMNS + ['archived_at'], copied))
+		# the items lose these reservations from their counts
+		parents = parents_of(db.session, reservations, ids)
+		db.session.execute(reservations.delete().where(reservations.c.id.in_(ids)))
+		recount(db.session, parents)
+		touch(db.session, reservations.name, archive.name)
+		db.session.commit()
+		moved += len(ids)
+	return moved
+
+class ArchiveScheduler(Scheduler):
+	"""
+	Run archive_reservations every ARCHIVE_INTERVAL seconds
+	"""
+	extension = 'archive_scheduler'
+	interval_key = 'ARCHIVE_INTERVAL'
+
+	def job(self):
+		moved = archive_reservations()
+		if moved:
+			self.app.logger.info('Archived %d reservations', moved)
@@ -2,8 +2,8 @@ from flask_wtf import FlaskForm
 from wtforms import PasswordField, StringField, SubmitField, ValidationError
 from wtforms.validators import DataRequired, Email, EqualTo
 from wtforms.fields.html5 import DateField, EmailField
-from wtforms.ext.sqlalchemy.fields import QuerySelectField
 
+from ..choices import CachedSelectField
 from ..models import Item, Brother
 from ..validators import Length, Password, AfterDate
 
@@ -52,7 +52,7 @@ class ReservationAddForm(ReservationForm):
     """
     hasItem = False
 
-    item = QuerySelectField(query_factory=lambda: Item.query.all(), get_label="name")
+    item = CachedSelectField(model=Item)
     submit = SubmitField('Submit')
 
 class ReservationAddForItemForm(ReservationForm):
@@ -1,11 +1,19 @@
-from flask import flash, redirect, render_template, url_for
+from flask import abort, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required, login_user, logout_user
 from flask_mail import Message
 
 from . import auth
 from .forms import RegistrationForm, LoginForm, ReservationAddForm, ReservationAddForItemForm, ReservationEditForm, ResetPasswordGetEmailForm, ResetPasswordForm
-from .. import db, mail
-from ..models import Item, Reservation, Brother, Unit, Shelf, Container
+from .. import db, mailer
+from ..conflicts import find_conflicts
+from ..listings import item_listing, reservation_count_map, location_maps, ITEM_SORTS, RESERVATION_SORTS, ARCHIVE_SORTS, BROTHER_SORTS, UNIT_SORTS, CONTAINER_SORTS
+from ..locations import location_tree
+from ..pagination import paginate
+from ..routing import read_only
+from ..search import search_index
+from ..users import user_cache
+from ..versions import conditional
+from ..models import ArchivedReservation, Item, Reservation, Brother, Unit, Shelf, Container
 from ..security import generate_confirmation_token, confirm_token
 
 
@@ -36,7 +44,7 @@ def register():
         toFlash = 'A confirmation email has been sent to the address you provided, please confirm before continuing'
 
         msg = Message(html=html, sender='alphagammawebmaster@gmail.com', subject='Please Confirm Your Email', recipients=[brother.email])
-        mail.send(msg)
+        mailer.send(msg)
 
         flash(toFlash)
         # redirect to the dashboard page
@@ -60,6 +68,11 @@ def login():
         # the password entered matches the password in the database
         brother = Brother.query.filter_by(email=form.email.data).first()
         if brother is not None and brother.verify_password(form.password.data):
+            # verify_password upgrades hashes made with older settings
+            if db.session.is_modified(brother):
+                db.session.commit()
+                user_cache.invalidate(brother.id)
+
             if not brother.email_confirmed:
             	flash('Unable to login until email is confirmed.')
             	return render_template('auth/login.html', form=form, title='Login')
@@ -96,7 +109,7 @@ def send_reset_email():
         toFlash = 'A link to reset has been sent to the address you provided'
 
         msg = Message(html=html, sender='alphagammawebmaster@gmail.com', subject='Reset Password Link', recipients=[brother.email])
-        mail.send(msg)
+        mailer.send(msg)
 
         flash(toFlash)
 
@@ -121,6 +134,7 @@ def reset_password(token):
         brother.password = form.new_password.data
         db.session.add(brother)
         db.session.commit()
+        user_cache.invalidate(brother.id)
         flash('You have successfully reset your password!', 'success')
         return redirect(url_for('auth.login'))
 
@@ -147,6 +161,7 @@ def confirm_email(token):
         brother.email_confirmed = True
         db.session.add(brother)
         db.session.commit()
+        user_cache.invalidate(brother.id)
         flash('You have confirmed your account. Thanks!', 'success')
     if brother.is_admin:
         return redirect(url_for('home.admin_dashboard'))
@@ -169,6 +184,8 @@ def logout():
 @auth.route('/items', methods=['GET', 'POST'])
 @auth.route('/items/<int:type_code>/<int:object_id>', methods=['GET', 'POST'])
 @login_required
+@read_only
+@conditional(Item, Unit, Shelf, Container, Reservation)
 def list_items(type_code=-1, object_id=None):
     """
     List all items
@@ -176,33 +193,45 @@ def list_items(type_code=-1, object_id=None):
 
     shelf = Shelf()
     unit = Unit()
-    if type_code == -1:
-        items = Item.query.all()
-        for item in items:
-            if item.unit_id:
-                item.unit = Unit.query.filter_by(id=item.unit_id).first()
-            else:
-                item.unit = None
-            if item.shelf_id:
-                item.shelf = Shelf.query.filter_by(id=item.shelf_id).first()
-            else:
-                item.shelf = None
-    elif type_code == 0:
-        items = Item.query.filter_by(shelf_id=object_id).all()
+    filters = {}
+    if type_code == 0:
+        filters = {'shelf_id': object_id}
         shelf = Shelf.query.get(object_id)
         unit = Unit.query.filter_by(id=shelf.unit_id).first()
     elif type_code == 1:
         #item_id is 0 and brother_id is not
-        items = Item.query.filter_by(unit_id=object_id).all()
+        filters = {'unit_id': object_id}
         unit = Unit.query.get(object_id)
 
+    page = paginate(item_listing(**filters), ITEM_SORTS, Item.id, 'name')
+
     return render_template('auth/items/items.html',
-                           items=items, unit=unit, shelf=shelf,
+                           items=page.items, page=page, unit=unit, shelf=shelf,
                            title="Items")
 
+@auth.route('/search')
+@login_required
+def search_items():
+    """
+    Search items by name, description and location
+    """
+    query = request.args.get('q', '').strip()
+
+    items = []
+    if query:
+        ids = search_index.search(query)
+        if ids:
+            rows = dict((row.id, row) for row in item_listing().filter(Item.id.in_(ids)))
+            items = [rows[id] for id in ids if id in rows]
+
+    return render_template('auth/items/search.html',
+                           items=items, query=query, title='Search')
+
 @auth.route('/reservations')
 @auth.route('/reservations/<int:type_code>/<int:object_id>')
 @login_required
+@read_only
+@conditional(Reservation, Item, Brother)
 def list_reservations(type_code=-1, object_id=0):
     """
     List all reservations
@@ -210,18 +239,44 @@ def list_reservations(type_code=-1, object_id=0):
 
     item = Item()
     brother = Brother()
-    if type_code == -1:
-        reservations = Reservation.query.all()
-    elif type_code == 0:
-        reservations = Reservation.query.filter_by(item_id=object_id).all()
+    reservations = Reservation.query
+    if type_code == 0:
+        reservations = reservations.filter_by(item_id=object_id)
         item = Item.query.get(object_id)
     elif type_code == 1:
         #item_id is 0 and brother_id is not
-        reservations = Reservation.query.filter_by(brother_id=object_id).all()
+        reservations = reservations.filter_by(brother_id=object_id)
         brother = Brother.query.get(object_id)
 
+    page = paginate(reservations, RESERVATION_SORTS, Reservation.id, 'date')
+
     return render_template('auth/reservations/reservations.html',
-                           reservations=reservations, title='Reservations', item=item, brother=brother)
+                           reservations=page.items, page=page, title='Reservations', item=item, brother=brother)
+
+@auth.route('/reservations/history')
+@auth.route('/reservations/history/<int:type_code>/<int:object_id>')
+@login_required
+@read_only
+@conditional(ArchivedReservation, Item, Brother)
+def reservation_history(type_code=-1, object_id=0):
+    """
+    List the reservations that were moved to the archive
+    """
+
+    item = Item()
+    brother = Brother()
+    reservations = ArchivedReservation.query
+    if type_code == 0:
+        reservations = reservations.filter_by(item_id=object_id)
+        item = Item.query.get(object_id)
+    elif type_code == 1:
+        reservations = reservations.filter_by(brother_id=object_id)
+        brother = Brother.query.get(object_id)
+
+    page = paginate(reservations, ARCHIVE_SORTS, ArchivedReservation.id, 'date')
+
+    return render_template('auth/reservations/history.html',
+                           reservations=page.items, page=page, title='Reservation History', item=item, brother=brother)
 
 @auth.route('/reservations/add', methods=['GET', 'POST'])
 @auth.route('/reservations/add/<int:item_id>', methods=['GET', 'POST'])
@@ -245,31 +300,34 @@ def add_reservation(item_id=0):
         #     flash('Error: requested item does not exist')
 
         if item_id == 0:
-            item_name=form.item.data.name
-            item_id=form.item.data.id
+            item = form.item.data
         else:
-            item_name=form.item.name
-            item_id=form.item.id
-
-        reservation = Reservation(reason=form.reason.data,
-                    fromDate=form.fromDate.data,
-                    toDate=form.toDate.data,
-                    item_name = item_name,
-                    item_id = item_id,
-                    reserved_by=current_user.first_name + ' ' + current_user.last_name,
-                    brother_id=current_user.id)
-
-        try:
-            # add reservation to the database
-            db.session.add(reservation)
-            db.session.commit()
-            flash('You have successfully added a new reservation for the %s.' % item_name)
-        except:
-            # in case reservation name already exists
-            flash('Error: reservation name already exists.')
+            item = form.item
 
-        # redirect to the reservations page
-        return redirect(url_for('auth.list_reservations'))
+        if item.stock == 0:
+            flash('Error: the %s has a quantity of 0 and cannot be reserved.' % item.name, 'danger')
+        elif find_conflicts(item, form.fromDate.data, form.toDate.data):
+            flash('Error: the %s is already fully reserved on some of those dates.' % item.name, 'danger')
+        else:
+            reservation = Reservation(reason=form.reason.data,
+                        fromDate=form.fromDate.data,
+                        toDate=form.toDate.data,
+                        item_name = item.name,
+                        item_id = item.id,
+                        reserved_by=current_user.first_name + ' ' + current_user.last_name,
+                        brother_id=current_user.id)
+
+            try:
+                # add reservation to the database
+                db.session.add(reservation)
+                db.session.commit()
+                flash('You have successfully added a new reservation for the %s.' % item.name)
+            except:
+                # in case reservation name already exists
+                flash('Error: reservation name already exists.')
+
+            # redirect to the reservations page
+            return redirect(url_for('auth.list_reservations'))
 
     # load reservation template
     return render_template('auth/reservations/reservation.html', add_reservation=add_reservation,
@@ -288,16 +346,21 @@ def edit_reservation(id):
     form = ReservationEditForm(obj=reservation)
     form.item = reservation.item
     if form.validate_on_submit():
-        reservation.reason = form.reason.data
-        reservation.fromDate = form.fromDate.data
-        reservation.toDate = form.toDate.data
-        reservation.approved = False
-        db.session.add(reservation)
-        db.session.commit()
-        flash('You have successfully edited the reservation. It will need to be reapproved.')
+        if reservation.item.stock == 0:
+            flash('Error: the %s has a quantity of 0 and cannot be reserved.' % reservation.item.name, 'danger')
+        elif find_conflicts(reservation.item, form.fromDate.data, form.toDate.data, exclude_id=reservation.id):
+            flash('Error: the %s is already fully reserved on some of those dates.' % reservation.item.name, 'danger')
+        else:
+            reservation.reason = form.reason.data
+            reservation.fromDate = form.fromDate.data
+            reservation.toDate = form.toDate.data
+            reservation.approved = False
+            db.session.add(reservation)
+            db.session.commit()
+            flash('You have successfully edited the reservation. It will need to be reapproved.')
 
-        # redirect to the reservations page
-        return redirect(url_for('auth.list_reservations'))
+            # redirect to the reservations page
+            return redirect(url_for('auth.list_reservations'))
 
     form.reason.data = reservation.reason
     form.fromDate.data = reservation.fromDate
@@ -324,40 +387,53 @@ def delete_reservation(id):
 
 @auth.route('/brothers')
 @login_required
+@read_only
+@conditional(Brother)
 def list_brothers():
     """
     List all employees
     """
 
-    brothers = Brother.query.all()
+    page = paginate(Brother.query, BROTHER_SORTS, Brother.id, 'name')
     return render_template('auth/brothers/brothers.html',
-                           brothers=brothers, title='Brothers')
+                           brothers=page.items, page=page, title='Brothers')
 
 @auth.route('/units')
 @login_required
+@read_only
+@conditional(Unit, Item, Shelf)
 def list_units():
     """
     List all employees
     """
 
-    units = Unit.query.all()
+    page = paginate(Unit.query, UNIT_SORTS, Unit.id, 'name')
     return render_template('auth/units/units.html',
-                           units=units, title='Units')
+                           units=page.items, page=page, title='Units')
 
 @auth.route('/units/list_items/<int:unit_id>', methods=['GET', 'POST'])
 @login_required
+@read_only
+@conditional(Item, Unit, Shelf, Container, Reservation)
 def list_items_unit(unit_id):
 
-    unit = Unit.query.get_or_404(unit_id)
+    unit = location_tree.get().units.get(unit_id)
+    if unit is None:
+        abort(404)
+    counts = reservation_count_map(unit_id=unit_id)
 
-    return render_template('auth/items/items_in_unit.html', unit=unit, title="Items")
+    return render_template('auth/items/items_in_unit.html', unit=unit, counts=counts, title="Items")
 
 @auth.route('/units/shelves/<int:unit_id>', methods=['GET', 'POST'])
 @login_required
+@read_only
+@conditional(Unit, Shelf, Item)
 def list_shelves(unit_id):
 
-    unit = Unit.query.filter_by(id=unit_id).first()
-    shelves = Shelf.query.filter_by(unit_id=unit_id).all()
+    unit = location_tree.get().units.get(unit_id)
+    if unit is None:
+        abort(404)
+    shelves = unit.shelves
     
     return render_template('auth/shelves/shelves.html',
                            unit=unit, shelves=shelves, title='Shelves')
@@ -365,22 +441,33 @@ def list_shelves(unit_id):
 @auth.route('/containers', methods=['GET', 'POST'])
 @auth.route('/containers/<int:shelf_id>', methods=['GET', 'POST'])
 @login_required
+@read_only
+@conditional(Container, Unit, Shelf, Item)
 def list_containers(shelf_id=None):
 
 
     shelf = Shelf.query.filter_by(id=shelf_id).first()
     if shelf_id:
-        containers = Container.query.filter_by(shelf_id=shelf_id).all()
+        containers = Container.query.filter_by(shelf_id=shelf_id)
     else:
-        containers = Container.query.all()
+        containers = Container.query
+    page = paginate(containers, CONTAINER_SORTS, Container.id, 'name')
+
+    units, shelves = location_maps(page.items)
 
     return render_template('auth/containers/containers.html',
-                            shelf=shelf, containers=containers, title='Containers')
+                            shelf=shelf, containers=page.items, page=page, units=units, shelves=shelves,
+                            title='Containers')
     
 @auth.route('/containers/list_items/<int:container_id>', methods=['GET', 'POST'])
 @login_required
+@read_only
+@conditional(Item, Unit, Shelf, Container, Reservation)
 def list_items_container(container_id):
 
-    container = Container.query.get_or_404(container_id)
+    container = location_tree.get().containers.get(container_id)
+    if container is None:
+        abort(404)
+    counts = reservation_count_map(container_id=container_id)
 
-    return render_template('auth/items/items_in_container.html', container=container, title="Items")
+    return render_template('auth/items/items_in_container.html', container=container, counts=counts, title="Items")
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from app import db
+from .models import Item, Reservation
+
+# NumPy is slow to import, so it is only looked for on the first long range
+numpy = False
+
+def _numpy():
+	global numpy
+	if numpy is False:
+		try:
+			import numpy as module
+		except ImportError:
+			module = None
+		numpy = module
+	return numpy
+
+# Ranges at least this many days long are swept with NumPy when it is installed
+VECTORIZE_MIN_DAYS = 60
+
+def _daily_usage(intervals, start, days):
+	"""
+	Sweep over (fromDate, toDate) intervals and return how many of them are
+	out on each of the days following start
+	"""
+	offsets = [(max((fromDate - start).days, 0), min((toDate - start).days, days - 1))
+			   for fromDate, toDate in intervals]
+
+	if days >= VECTORIZE_MIN_DAYS and _numpy() is not None:
+		changes = numpy.zeros(days + 1, dtype=numpy.int64)
+		if offsets:
+			bounds = numpy.array(offsets, dtype=numpy.int64)
+			numpy.add.at(changes, bounds[:, 0], 1)
+			numpy.add.at(changes, bounds[:, 1] + 1, -1)
+		return numpy.cumsum(changes[:days]).tolist()
+
+	changes = [0] * (days + 1)
+	for first, last in offsets:
+		changes[first] += 1
+		changes[last + 1] -= 1
+	usage = []
+	out = 0
+	for change in changes[:days]:
+		out += change
+		usage.append(out)
+	return usage
+
+def availability(items, start, end):
+	"""
+	Return the free quantity of every item on every day from start to end
+	(both inclusive) as a dict of item id to a list of (date, free) pairs.
+
+	The reservations of all the items are read in a single query.
+	"""
+	days = (end - start).days + 1
+	intervals = dict((item.id, []) for item in items)
+
+	if intervals:
+		rows = db.session.query(Reservation.item_id, Reservation.fromDate, Reservation.toDate) \
+			.filter(Reservation.item_id.in_(list(intervals)),
+					Reservation.fromDate <= end,
+					Reservation.toDate >= start)
+		for item_id, fromDate, toDate in rows:
+			intervals[item_id].append((fromDate, toDate))
+
+	dates = [start + timedelta(days=offset) for offset in range(days)]
+	result = {}
+	for item in items:
+		usage = _daily_usage(intervals[item.id], start, days)
+		result[item.id] = [(day, max(item.stock - out, 0)) for day, out in zip(dates, usage)]
+	return result
@@ -0,0 +1,92 @@
+import threading
+
+from wtforms import widgets
+from wtforms.fields import SelectFieldBase
+from wtforms.validators import ValidationError
+
+from app import db
+from .versions import current_versions
+
+class Choices(object):
+	"""
+	(id, label) options of a select, with the ids as strings the way they
+	come back from the browser
+	"""
+	def __init__(self, version, options):
+		self.version = version
+		self.options = options
+		self.ids = frozenset(id for id, label in options)
+
+class ChoiceCache(object):
+	"""
+	Keep the (id, label) choices of the dropdowns that list every row of a
+	table, so rendering and validating a form does not load the whole table
+	as ORM objects. The choices are reloaded when the table's version
+	changes.
+	"""
+	def __init__(self):
+		self._choices = {}
+		self._lock = threading.Lock()
+
+	def get(self, model, label='name'):
+		table = model.__table__.name
+		version = current_versions(table).get(table, (0, None))[0]
+		choices = self._choices.get((table, label))
+		if choices is not None and choices.version == version:
+			return choices
+		with self._lock:
+			rows = db.session.query(model.id, getattr(model, label)).order_by(model.id)
+			choices = Choices(version, [(str(id), text) for id, text in rows])
+			self._choices[(table, label)] = choices
+		return choices
+
+choice_cache = ChoiceCache()
+
+class CachedSelectField(SelectFieldBase):
+	"""
+	Drop-in replacement for QuerySelectField over a whole table. Options
+	come from the choice cache, and data is the chosen model instance, loaded
+	by its primary key only when it is read.
+	"""
+	widget = widgets.Select()
+
+	def __init__(self, label=None, validators=None, model=None, get_label='name', **kwargs):
+		super(CachedSelectField, self).__init__(label, validators, **kwargs)
+		self.model = model
+		self.get_label = get_label
+		self._choices = None
+
+	def _get_choices(self):
+		if self._choices is None:
+			self._choices = choice_cache.get(self.model, self.get_label)
+		return self._choices
+
+	def _get_data(self):
+		if self._formdata is not None:
+			if self._formdata in self._get_choices().ids:
+				self._set_data(self.model.query.get(int(self._formdata)))
+			else:
+				self._set_data(None)
+		return self._data
+
+	def _set_data(self, data):
+		self._data = data
+		self._formdata = None
+
+	data = property(_get_data, _set_data)
+
+	def iter_choices(self):
+		selected = self._formdata
+		if selected is None and self._data is not None:
+			selected = str(self._data.id)
+		for id, label in self._get_choices().options:
+			yield (id, label, id == selected)
+
+	def process_formdata(self, valuelist):
+		if valuelist:
+			self._data = None
+			self._formdata = valuelist[0]
+
+	def pre_validate(self, form):
+		if self.data is None:
+			raise ValidationError(self.gettext('Not a valid choice'))
@@ -0,0 +1,101 @@
+import os
+
+import click
+from flask.cli import AppGroup
+
+from . import db
+from .archive import archive_reservations
+from .counters import recount
+from .maintenance import repair_locations
+from .startup import profile
+from .transfer import EXPORTS, FORMATS, export, import_items, read
+
+inventory = AppGroup('inventory', help='Manage the inventory from the command line.')
+
+def _format(format, filename):
+	if format:
+		return format
+	return 'jsonl' if os.path.splitext(filename)[1] in ('.jsonl', '.json') else 'csv'
+
+@inventory.command('export')
+@click.argument('table', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', type=click.Choice(FORMATS), help='Defaults to the extension of the output file, or csv.')
+@click.option('--output', '-o', type=click.File('w'), default='-', help='File to write to instead of stdout.')
+def export_command(table, format, output):
+	"""
+	Export a table as CSV or JSON lines
+	"""
+	for chunk in export(table, _format(format, output.name)):
+		output.write(chunk)
+
+@inventory.command('import')
+@click.argument('file', type=click.File('r'))
+@click.option('--format', type=click.Choice(FORMATS), help='Defaults to the extension of the file, or csv.')
+@click.option('--chunk-size', type=int, help='Rows written per transaction.')
+def import_command(file, format, chunk_size):
+	"""
+	Import items from CSV or JSON lines, creating their locations
+	"""
+	result = import_items(read(file, _format(format, file.name)), chunk_size)
+	click.echo('%d items created, %d updated' % (result.created, result.updated))
+	for number, error in result.errors:
+		click.echo('line %d: %s' % (number, error), err=True)
+
+@inventory.command('repair')
+@click.option('--dry-run', is_flag=True, help='Only report what would change.')
+def repair_command(dry_run):
+	"""
+	Fix items and containers whose location references are broken
+	"""
+	changed = repair_locations(dry_run)
+	for name, count in changed.items():
+		click.echo('%6d %s' % (count, name))
+	if dry_run:
+		click.echo('Nothing was changed.')
+
+@inventory.command('recount')
+@click.option('--dry-run', is_flag=True, help='Only report how many counters are wrong.')
+def recount_command(dry_run):
+	"""
+	Recompute the item, shelf and reservation counters from the rows
+	"""
+	changed = recount(db.session)
+	if dry_run:
+		db.session.rollback()
+	else:
+		db.session.commit()
+	click.echo('%d rows had a wrong counter' % changed)
+	if dry_run:
+		click.echo('Nothing was changed.')
+
+@inventory.command('archive')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']),
+			  help='Archive reservations that ended before this date instead of the configured horizon.')
+@click.option('--batch-size', type=int, help='Reservations moved per transaction.')
+@click.option('--dry-run', is_flag=True, help='Only report how many reservations would be archived.')
+def archive_command(before, batch_size, dry_run):
+	"""
+	Move reservations that ended long ago to the archive
+	"""
+	moved = archive_reservations(before.date() if before else None, batch_size, dry_run)
+	if dry_run:
+		click.echo('%d reservations would be archived' % moved)
+	else:
+		click.echo('%d reservations archived' % moved)
+
+@click.command('startup-profile')
+@click.option('--config', default=lambda: os.getenv('FLASK_CONFIG', 'production'), help='Configuration to create the app with.')
+@click.option('--top', type=int, default=15, help='Number of imported packages to show.')
+def startup_profile(config, top):
+	"""
+	Report how long a fresh process takes to import and create the app
+	"""
+	result = profile(config, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	click.echo('import app  %8.1f ms' % (result['import'] * 1000))
+	click.echo('create_app  %8.1f ms' % (result['create_app'] * 1000))
+	click.echo('\nPackages imported by the app:')
+	for name, seconds in result['packages'][:top]:
+		click.echo('  %-28s %8.1f ms' % (name, seconds * 1000))
+	click.echo('\ncreate_app steps, imports included:')
+	for name, seconds in result['steps']:
+		click.echo('  %-28s %8.1f ms' % (name, seconds * 1000))
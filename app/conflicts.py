@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+
+from app import db
+from .models import Item, Reservation
+
+def overlapping(item_id, from_date, to_date, exclude_id=None):
+	"""
+	Query the reservations of an item whose dates intersect from_date to
+	to_date (both inclusive).
+
+	The (item_id, fromDate, toDate) index turns this into a range scan over
+	the item's reservations starting before to_date.
+	"""
+	query = Reservation.query.filter(Reservation.item_id == item_id,
+									 Reservation.fromDate <= to_date,
+									 Reservation.toDate >= from_date)
+	if exclude_id is not None:
+		query = query.filter(Reservation.id != exclude_id)
+	return query
+
+def peak_usage(reservations, from_date, to_date):
+	"""
+	Sweep over the reservations and return the largest number of them that
+	are out on any single day between from_date and to_date
+	"""
+	events = []
+	for reservation in reservations:
+		start = max(reservation.fromDate, from_date)
+		end = min(reservation.toDate, to_date)
+		if start > end:
+			continue
+		events.append((start, 1))
+		events.append((end + timedelta(days=1), -1))
+
+	# returns sort before pickups on the same day
+	events.sort()
+	peak = usage = 0
+	for day, change in events:
+		usage += change
+		peak = max(peak, usage)
+	return peak
+
+def find_conflicts(item, from_date, to_date, exclude_id=None):
+	"""
+	Return the reservations that would leave the item overbooked if it was
+	also reserved from from_date to to_date, or an empty list if the
+	booking fits in the item's quantity
+	"""
+	existing = overlapping(item.id, from_date, to_date, exclude_id).all()
+	if peak_usage(existing, from_date, to_date) + 1 > item.stock:
+		return existing
+	return []
+
+def conflicting_reservations(query):
+	"""
+	Restrict a Reservation query to the reservations that are out on some
+	day together with as many others of the same item as the item has
+	quantity, i.e. the ones find_conflicts would have rejected.
+
+	Usage only grows on the day a reservation is picked up, so a
+	reservation is overbooked iff more reservations than the quantity are
+	out on the pickup day of one of the reservations starting within its
+	dates (itself included). The check is a subquery correlated to the
+	outer reservation, so whatever query filters on narrows it down.
+	"""
+	pickup = aliased(Reservation)
+	out = aliased(Reservation)
+	usage = db.session.query(func.count(out.id)) \
+		.filter(out.item_id == pickup.item_id,
+				out.fromDate <= pickup.fromDate,
+				out.toDate >= pickup.fromDate) \
+		.correlate(pickup) \
+		.as_scalar()
+	overbooked = db.session.query(pickup.id) \
+		.join(Item, Item.id == pickup.item_id) \
+		.filter(pickup.item_id == Reservation.item_id,
+				pickup.fromDate >= Reservation.fromDate,
+				pickup.fromDate <= Reservation.toDate,
+				usage > func.coalesce(Item.quantity, 1)) \
+		.correlate(Reservation)
+	return query.filter(overbooked.exists())
@@ -0,0 +1,105 @@
+from collections import defaultdict
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app import db
+from .models import Item, Reservation, Unit, Shelf, Container
+
+class Counter(object):
+	"""
+	A column of parent that holds how many rows of child point at it
+	"""
+	def __init__(self, parent, name, child, column):
+		self.parent = parent
+		self.name = name
+		self.child = child
+		self.column = column
+
+	def count(self):
+		parents = self.parent.__table__
+		children = self.child.__table__
+		return select([func.count()]).where(children.c[self.column] == parents.c.id).as_scalar()
+
+	def statement(self, ids=None):
+		"""
+		UPDATE the counter of the given parents, or of every parent, with
+		the real count. Rows that are already right are not written.
+		"""
+		parents = self.parent.__table__
+		count = self.count()
+		statement = parents.update().where(parents.c[self.name] != count).values({self.name: count})
+		if ids is not None:
+			statement = statement.where(parents.c.id.in_(ids))
+		return statement
+
+COUNTERS = [
+	Counter(Unit, 'item_count', Item, 'unit_id'),
+	Counter(Unit, 'shelf_count', Shelf, 'unit_id'),
+	Counter(Shelf, 'item_count', Item, 'shelf_id'),
+	Counter(Container, 'item_count', Item, 'container_id'),
+	Counter(Item, 'reservation_count', Reservation, 'item_id'),
+]
+
+def parents_of(session, table, ids, parents=None):
+	"""
+	Add the parents the rows of table with the given ids are counted in
+	to parents, a dict of sets of ids keyed by the parent model. Writes
+	that bypass the session call this before and after changing the rows.
+	"""
+	parents = parents if parents is not None else defaultdict(set)
+	ids = list(ids)
+	counters = [counter for counter in COUNTERS if counter.child.__table__ is table]
+	if not ids or not counters:
+		return parents
+	columns = [table.c[counter.column] for counter in counters]
+	for row in session.execute(select(columns).where(table.c.id.in_(ids))):
+		for counter, id in zip(counters, row):
+			if id is not None:
+				parents[counter.parent].add(id)
+	return parents
+
+def recount(session, parents=None):
+	"""
+	Set the counters of parents, a dict of sets of ids keyed by model as
+	given by parents_of, to the real counts in the session's transaction.
+	Without parents every counter of every row is recomputed. Return the
+	number of rows that were wrong.
+	"""
+	changed = 0
+	for counter in COUNTERS:
+		if parents is None:
+			changed += session.execute(counter.statement()).rowcount
+			continue
+		ids = parents.get(counter.parent)
+		if not ids:
+			continue
+		changed += session.execute(counter.statement(sorted(ids))).rowcount
+		# loaded parents would keep showing the old count until the commit
+		for id in ids:
+			obj = session.identity_map.get(identity_key(counter.parent, id))
+			if obj is not None:
+				session.expire(obj, [counter.name])
+	return changed
+
+@event.listens_for(Session, 'after_flush')
+def _count_flushed(session, flush_context):
+	"""
+	Recount the parents of the items, shelves and reservations this flush
+	added, moved or deleted, before and after the move
+	"""
+	parents = defaultdict(set)
+	dirty = session.dirty
+	for obj in list(session.new) + list(dirty) + list(session.deleted):
+		for counter in COUNTERS:
+			if not isinstance(obj, counter.child):
+				continue
+			history = inspect(obj).attrs[counter.column].history
+			if obj in dirty and not history.has_changes():
+				continue
+			for id in history.sum():
+				if id is not None:
+					parents[counter.parent].add(id)
+	if parents:
+		recount(session, parents)
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+class FragmentCache(object):
+	"""
+	Rendered template fragments by key, at most FRAGMENT_CACHE_SIZE of
+	them, least recently used first out. 0 turns caching off.
+
+	Nothing is ever invalidated: keys are made of the data a fragment
+	shows, so a changed row gets a new key and its old fragment ages out.
+	"""
+	def __init__(self):
+		self._fragments = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def get_or_render(self, key, render):
+		size = current_app.config['FRAGMENT_CACHE_SIZE']
+		if not size:
+			return render()
+		with self._lock:
+			fragment = self._fragments.get(key)
+			if fragment is not None:
+				self._fragments.move_to_end(key)
+				self.hits += 1
+				return fragment
+			self.misses += 1
+
+		fragment = render()
+		with self._lock:
+			self._fragments[key] = fragment
+			while len(self._fragments) > size:
+				self._fragments.popitem(last=False)
+		return fragment
+
+	def reset_counts(self):
+		with self._lock:
+			self.hits = 0
+			self.misses = 0
+
+	def clear(self):
+		with self._lock:
+			self._fragments.clear()
+
+	def __len__(self):
+		return len(self._fragments)
+
+fragment_cache = FragmentCache()
+
+class FragmentCacheExtension(Extension):
+	"""
+	{% cache key, ... %}...{% endcache %} renders its body once per key
+	and then serves it from fragment_cache. The key is made of the given
+	values, which must be hashable, and the template and line of the tag.
+	It has to cover everything the body shows, every column of the row
+	it prints as well as the template variables the body reads. Ids alone
+	are not enough, SQLite hands the id of a deleted row to the next one.
+	"""
+	tags = set(['cache'])
+
+	def parse(self, parser):
+		lineno = next(parser.stream).lineno
+		keys = [parser.parse_expression()]
+		while parser.stream.skip_if('comma'):
+			keys.append(parser.parse_expression())
+		body = parser.parse_statements(['name:endcache'], drop_needle=True)
+		where = nodes.Const('%s:%d' % (parser.name, lineno))
+		call = self.call_method('_render', [where, nodes.Tuple(keys, 'load')])
+		return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+	def _render(self, where, key, caller):
+		return fragment_cache.get_or_render((where,) + key, caller)
@@ -0,0 +1,158 @@
+import binascii
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, gen_salt, generate_password_hash
+
+class PBKDF2Hasher(object):
+	"""
+	werkzeug's PBKDF2-SHA256 hashes, cost is the number of iterations
+	"""
+	name = 'pbkdf2'
+
+	def __init__(self, cost):
+		self.cost = int(cost)
+
+	def method(self):
+		return 'pbkdf2:sha256:%d' % self.cost
+
+	def hash(self, password):
+		return generate_password_hash(password, method=self.method())
+
+	def verify(self, password_hash, password):
+		return check_password_hash(password_hash, password)
+
+	def matches(self, password_hash):
+		return password_hash.split('$', 1)[0] == self.method()
+
+class ScryptHasher(object):
+	"""
+	scrypt hashes from hashlib, cost is log2 of the work factor N. Memory
+	use grows with N as well as time.
+	"""
+	name = 'scrypt'
+	r = 8
+	p = 1
+
+	def __init__(self, cost):
+		self.cost = int(cost)
+
+	def method(self):
+		return 'scrypt:%d:%d:%d' % (1 << self.cost, self.r, self.p)
+
+	@staticmethod
+	def _derive(password, salt, n, r, p):
+		key = hashlib.scrypt(password.encode('utf-8'), salt=salt.encode('utf-8'),
+							 n=n, r=r, p=p, maxmem=256 * n * r + (1 << 20), dklen=32)
+		return binascii.hexlify(key).decode('ascii')
+
+	def hash(self, password):
+		salt = gen_salt(16)
+		return '%s$%s$%s' % (self.method(), salt, self._derive(password, salt, 1 << self.cost, self.r, self.p))
+
+	def verify(self, password_hash, password):
+		try:
+			method, salt, expected = password_hash.split('$', 2)
+			n, r, p = (int(value) for value in method.split(':')[1:])
+		except ValueError:
+			return False
+		return hmac.compare_digest(self._derive(password, salt, n, r, p), expected)
+
+	def matches(self, password_hash):
+		return password_hash.split('$', 1)[0] == self.method()
+
+HASHERS = {
+	'pbkdf2': PBKDF2Hasher,
+	'scrypt': ScryptHasher,
+}
+
+def _hasher_for(password_hash):
+	"""
+	The hasher class that made password_hash, from its method prefix
+	"""
+	return ScryptHasher if password_hash.startswith('scrypt:') else PBKDF2Hasher
+
+def _hash(name, cost, password):
+	return HASHERS[name](cost).hash(password)
+
+def _verify(password_hash, password):
+	# the cost is read from the hash
+	return _hasher_for(password_hash)(0).verify(password_hash, password)
+
+class PasswordHasher(object):
+	"""
+	Hash and check passwords with the hasher named by PASSWORD_HASHER at
+	PASSWORD_HASH_COST.
+
+	Hashing runs on a pool of PASSWORD_HASH_WORKERS threads, or processes
+	with PASSWORD_HASH_POOL set to 'process', so a rush of logins takes at
+	most that many cores of a worker and its other requests keep being
+	served. hashlib releases the GIL while it hashes, so threads run in
+	parallel. With no workers passwords are hashed in the request.
+
+	Hashes made by another hasher or at another cost still verify, and
+	needs_rehash() tells when one should be replaced.
+	"""
+	def __init__(self, app=None):
+		self.app = None
+		self._pool = None
+		self._pid = None
+		self._lock = threading.Lock()
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.app = app
+		app.extensions['password_hasher'] = self
+
+	def hasher(self):
+		config = self.app.config
+		return HASHERS[config['PASSWORD_HASHER']](config['PASSWORD_HASH_COST'])
+
+	def _executor(self):
+		# pools do not survive a fork, so every process starts its own
+		if self._pid != os.getpid():
+			with self._lock:
+				if self._pid != os.getpid():
+					workers = self.app.config['PASSWORD_HASH_WORKERS']
+					if self.app.config['PASSWORD_HASH_POOL'] == 'process':
+						self._pool = ProcessPoolExecutor(workers)
+					else:
+						self._pool = ThreadPoolExecutor(workers)
+					self._pid = os.getpid()
+		return self._pool
+
+	def shutdown(self):
+		"""
+		Stop the pool, the next hash starts a new one with the current
+		settings
+		"""
+		with self._lock:
+			if self._pool is not None and self._pid == os.getpid():
+				self._pool.shutdown()
+			self._pool = None
+			self._pid = None
+
+	def _call(self, function, *args):
+		if not self.app.config['PASSWORD_HASH_WORKERS']:
+			return function(*args)
+		return self._executor().submit(function, *args).result()
+
+	def hash(self, password):
+		hasher = self.hasher()
+		return self._call(_hash, hasher.name, hasher.cost, password)
+
+	def verify(self, password_hash, password):
+		if not password_hash:
+			return False
+		return self._call(_verify, password_hash, password)
+
+	def needs_rehash(self, password_hash):
+		"""
+		Whether password_hash was made by another hasher or at another cost
+		than the configured one
+		"""
+		return not self.hasher().matches(password_hash)
@@ -2,6 +2,7 @@ from flask import abort, render_template
 from flask_login import current_user, login_required
 
 from . import home
+from ..routing import read_only
 
 @home.route('/')
 def homepage():
@@ -12,6 +13,7 @@ def homepage():
 
 @home.route('/dashboard')
 @login_required
+@read_only
 def dashboard():
     """
     Render the dashboard template on the /dashboard route
@@ -20,6 +22,7 @@ def dashboard():
 
 @home.route('/admin/dashboard')
 @login_required
+@read_only
 def admin_dashboard():
     # prevent non-admins from accessing the page
     if not current_user.is_admin:
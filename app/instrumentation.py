@@ -0,0 +1,139 @@
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_numbers = re.compile(r'\b\d+(\.\d+)?\b')
+_strings = re.compile(r"'(?:[^']|'')*'")
+_lists = re.compile(r'\((\s*\?\s*,)+\s*\?\s*\)')
+_spaces = re.compile(r'\s+')
+
+def fingerprint(statement):
+	"""
+	Reduce a statement to its shape, so the same query run with different
+	values or IN lists of different lengths counts as one
+	"""
+	statement = _strings.sub('?', statement)
+	statement = _numbers.sub('?', statement)
+	statement = _lists.sub('(?...)', statement)
+	return _spaces.sub(' ', statement).strip()
+
+class RequestStats(object):
+	"""
+	The statements run while handling one request
+	"""
+	def __init__(self):
+		self.started = time.time()
+		self.queries = 0
+		self.db_time = 0.0
+		self.fingerprints = Counter()
+
+class EndpointStats(object):
+	"""
+	Totals over every request an endpoint handled since the process started
+	"""
+	def __init__(self, endpoint):
+		self.endpoint = endpoint
+		self.requests = 0
+		self.queries = 0
+		self.max_queries = 0
+		self.db_time = 0.0
+		self.total_time = 0.0
+		# statement shapes that ran too often in one request, with the most times seen
+		self.repeated = {}
+
+	def add(self, stats, total_time, repeated):
+		self.requests += 1
+		self.queries += stats.queries
+		self.max_queries = max(self.max_queries, stats.queries)
+		self.db_time += stats.db_time
+		self.total_time += total_time
+		for statement, count in repeated:
+			self.repeated[statement] = max(self.repeated.get(statement, 0), count)
+
+	@property
+	def average_queries(self):
+		return self.queries / float(self.requests)
+
+	@property
+	def average_db_ms(self):
+		return self.db_time * 1000 / self.requests
+
+	@property
+	def average_total_ms(self):
+		return self.total_time * 1000 / self.requests
+
+class SQLInstrumentation(object):
+	"""
+	Count the statements every request runs and how long the database took.
+
+	Each response gets a Server-Timing header with the database and total
+	time. Totals per endpoint are kept for the admin performance page, and
+	a warning is logged when one statement shape runs more than
+	SQL_REPEAT_WARNING times in a request, which is usually a query per row
+	of a listing. Turned off with SQL_INSTRUMENTATION.
+	"""
+	def __init__(self, app=None):
+		self.endpoints = {}
+		self._lock = threading.Lock()
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.app = app
+		app.extensions['sql_instrumentation'] = self
+		if not app.config['SQL_INSTRUMENTATION']:
+			return
+		if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+			event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+			event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+		app.before_request(self._before_request)
+		app.after_request(self._after_request)
+
+	def _before_request(self):
+		g.sql_stats = RequestStats()
+
+	def _after_request(self, response):
+		stats = g.pop('sql_stats', None)
+		if stats is None:
+			return response
+		total_time = time.time() - stats.started
+
+		threshold = self.app.config['SQL_REPEAT_WARNING']
+		repeated = [(statement, count) for statement, count in stats.fingerprints.items() if count > threshold]
+		for statement, count in repeated:
+			self.app.logger.warning('%s ran the same statement %d times: %s', request.endpoint, count, statement)
+
+		endpoint = request.endpoint or 'unknown'
+		with self._lock:
+			if endpoint not in self.endpoints:
+				self.endpoints[endpoint] = EndpointStats(endpoint)
+			self.endpoints[endpoint].add(stats, total_time, repeated)
+
+		response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%d queries"' % (stats.db_time * 1000, stats.queries))
+		response.headers.add('Server-Timing', 'total;dur=%.1f' % (total_time * 1000))
+		return response
+
+	def reset(self):
+		with self._lock:
+			self.endpoints = {}
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	# kept on the statement's context, which goes away with it when it fails
+	if context is not None:
+		context._query_started = time.time()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	started = getattr(context, '_query_started', None)
+	if started is None or not has_request_context():
+		return
+	stats = g.get('sql_stats')
+	if stats is None:
+		return
+	stats.queries += 1
+	stats.db_time += time.time() - started
+	stats.fingerprints[fingerprint(statement)] += 1
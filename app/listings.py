@@ -0,0 +1,86 @@
+from app import db
+from .models import ArchivedReservation, Item, Reservation, Brother, Unit, Shelf, Container
+from .pagination import SortKey
+
+# Sort keys accepted by the paginated list views
+ITEM_SORTS = {
+	'name': SortKey('name', Item.name),
+}
+
+RESERVATION_SORTS = {
+	'name': SortKey('item_name', Reservation.item_name),
+	'date': SortKey('fromDate', Reservation.fromDate, 'date'),
+	'approved': SortKey('approved', Reservation.approved, 'bool'),
+}
+
+ARCHIVE_SORTS = {
+	'name': SortKey('item_name', ArchivedReservation.item_name),
+	'date': SortKey('fromDate', ArchivedReservation.fromDate, 'date'),
+}
+
+BROTHER_SORTS = {
+	'name': SortKey('last_name', Brother.last_name),
+}
+
+UNIT_SORTS = {
+	'name': SortKey('name', Unit.name),
+}
+
+CONTAINER_SORTS = {
+	'name': SortKey('name', Container.name),
+}
+
+def reservation_count_map(**filters):
+	"""
+	Return the number of reservations of every item matching the Item
+	column filters as a dict keyed by item id, read from their counters
+	"""
+	query = db.session.query(Item.id, Item.reservation_count).filter(Item.reservation_count > 0)
+	for column, value in filters.items():
+		query = query.filter(getattr(Item, column) == value)
+	return dict(query)
+
+def item_listing(**filters):
+	"""
+	Query items together with the names of their unit, shelf and container
+	and their reservation count as a single joined statement.
+
+	Rows are plain result tuples, so rendering them never lazy loads a
+	relationship. Location ids come from the joined rows, so a reference to
+	a deleted unit, shelf or container reads as None just like the
+	relationship would. Keyword arguments filter on Item columns.
+	"""
+	query = db.session.query(Item.id, Item.name, Item.description, Item.quantity,
+							 Unit.id.label('unit_id'),
+							 Unit.name.label('unit_name'),
+							 Shelf.id.label('shelf_id'),
+							 Shelf.name.label('shelf_name'),
+							 Container.id.label('container_id'),
+							 Container.name.label('container_name'),
+							 Item.reservation_count) \
+		.outerjoin(Unit, Item.unit_id == Unit.id) \
+		.outerjoin(Shelf, Item.shelf_id == Shelf.id) \
+		.outerjoin(Container, Item.container_id == Container.id)
+
+	for column, value in filters.items():
+		query = query.filter(getattr(Item, column) == value)
+
+	return query
+
+def load_by_id(model, ids):
+	"""
+	Bulk load the rows of model with the given ids into a dict keyed by id
+	"""
+	ids = set(id for id in ids if id is not None)
+	if not ids:
+		return {}
+	return dict((obj.id, obj) for obj in model.query.filter(model.id.in_(ids)))
+
+def location_maps(objects):
+	"""
+	Resolve the units and shelves referenced by objects in two queries,
+	without touching their relationship attributes
+	"""
+	units = load_by_id(Unit, (obj.unit_id for obj in objects))
+	shelves = load_by_id(Shelf, (obj.shelf_id for obj in objects))
+	return units, shelves
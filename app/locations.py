@@ -0,0 +1,102 @@
+import threading
+
+from app import db
+from .models import Item, Unit, Shelf, Container
+from .routing import primary
+from .versions import current_versions
+
+# tables a LocationTree is loaded from
+TABLES = tuple(model.__table__.name for model in (Unit, Shelf, Container, Item))
+
+class Node(object):
+	"""
+	Read only copy of a unit, shelf, container or item row that can be
+	shared between requests
+	"""
+	def __init__(self, **columns):
+		self.__dict__.update(columns)
+
+	def __repr__(self):
+		return '<Node: {}>'.format(self.name)
+
+class LocationTree(object):
+	"""
+	The whole Unit -> Shelf -> Container -> Item hierarchy, loaded with one
+	query per table.
+
+	Units have shelves, containers and items lists, shelves have containers
+	and items, containers have items. Children point back at their parents
+	through unit, shelf and container, which are None for dangling ids.
+	"""
+	def __init__(self):
+		self.units = {}
+		for id, name, location in db.session.query(Unit.id, Unit.name, Unit.location).order_by(Unit.id):
+			self.units[id] = Node(id=id, name=name, location=location,
+								  shelves=[], containers=[], items=[])
+
+		self.shelves = {}
+		for id, name, unit_id in db.session.query(Shelf.id, Shelf.name, Shelf.unit_id).order_by(Shelf.id):
+			shelf = Node(id=id, name=name, unit_id=unit_id, unit=self.units.get(unit_id),
+						 containers=[], items=[])
+			self.shelves[id] = shelf
+			if shelf.unit is not None:
+				shelf.unit.shelves.append(shelf)
+
+		self.containers = {}
+		for id, name, unit_id, shelf_id in db.session.query(Container.id, Container.name,
+															Container.unit_id, Container.shelf_id) \
+				.order_by(Container.id):
+			container = Node(id=id, name=name, unit_id=unit_id, shelf_id=shelf_id,
+							 unit=self.units.get(unit_id), shelf=self.shelves.get(shelf_id), items=[])
+			self.containers[id] = container
+			for parent in (container.unit, container.shelf):
+				if parent is not None:
+					parent.containers.append(container)
+
+		self.items = {}
+		for id, name, description, quantity, unit_id, shelf_id, container_id in \
+				db.session.query(Item.id, Item.name, Item.description, Item.quantity,
+								 Item.unit_id, Item.shelf_id, Item.container_id).order_by(Item.id):
+			item = Node(id=id, name=name, description=description, quantity=quantity,
+						unit_id=unit_id, shelf_id=shelf_id, container_id=container_id,
+						unit=self.units.get(unit_id), shelf=self.shelves.get(shelf_id),
+						container=self.containers.get(container_id))
+			self.items[id] = item
+			for parent in (item.unit, item.shelf, item.container):
+				if parent is not None:
+					parent.items.append(item)
+
+class LocationTreeCache(object):
+	"""
+	Keep one LocationTree per process.
+
+	The tree remembers the versions of the tables it was loaded from and is
+	rebuilt on the next read after any process changed one of them. Views
+	that change units, shelves, containers or where items are kept also
+	call invalidate() after committing, which drops it right away.
+	"""
+	def __init__(self):
+		self._tree = None
+		self._lock = threading.Lock()
+
+	def get(self):
+		# the tree outlives the request, so it must not lag behind
+		with primary():
+			versions = current_versions(*TABLES)
+			tree = self._tree
+			if tree is not None and tree.versions == versions:
+				return tree
+			with self._lock:
+				if self._tree is not None and self._tree.versions == versions:
+					return self._tree
+				# versions read before the rows, so a change in between only
+				# causes another rebuild
+				tree = LocationTree()
+				tree.versions = versions
+				self._tree = tree
+				return tree
+
+	def invalidate(self):
+		self._tree = None
+
+location_tree = LocationTreeCache()
@@ -0,0 +1,172 @@
+import atexit
+import os
+import smtplib
+import socket
+import threading
+import time
+from queue import Empty, Queue
+
+from flask_mail import Message
+from markupsafe import escape
+
+class MailDispatcher(object):
+	"""
+	Send mail from a pool of background threads instead of the request.
+
+	Each worker thread keeps its own SMTP connection open between messages
+	and only closes it after MAIL_IDLE_TIMEOUT seconds without mail. Failed
+	sends are retried MAIL_MAX_RETRIES times with exponential backoff
+	starting at MAIL_RETRY_BACKOFF seconds. With MAIL_ASYNC turned off
+	messages are sent synchronously, as Mail.send would.
+
+	Notifications sent with coalesce=True are held back for
+	MAIL_DIGEST_WINDOW seconds per recipient and go out as a single digest,
+	so a burst of approvals costs one email instead of one each.
+
+	To try it against a local SMTP stand-in set MAIL_SERVER to 'localhost',
+	MAIL_PORT to its port and MAIL_USE_SSL to False.
+	"""
+
+	# errors retrying will not fix
+	permanent_errors = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+	def __init__(self, app=None):
+		self.app = None
+		self._queue = None
+		self._pid = None
+		self._lock = threading.Lock()
+		self._pending = {}
+		self._pending_lock = threading.Lock()
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.app = app
+		app.extensions['mail_dispatcher'] = self
+		atexit.register(self.flush, app.config['MAIL_IDLE_TIMEOUT'])
+
+	def send(self, message, coalesce=False):
+		"""
+		Queue a flask_mail Message for delivery, or hold it for the
+		recipient's next digest when coalesce is set and digests are enabled
+		"""
+		if coalesce and self.app.config['MAIL_DIGEST_WINDOW']:
+			self._hold(message)
+			return
+		self._dispatch(message)
+
+	def _dispatch(self, message):
+		if not self.app.config['MAIL_ASYNC']:
+			self.app.extensions['mail'].send(message)
+			return
+		self._start()
+		self._queue.put(message)
+
+	def _hold(self, message):
+		recipients = tuple(sorted(message.send_to))
+		with self._pending_lock:
+			if recipients not in self._pending:
+				self._pending[recipients] = []
+				timer = threading.Timer(self.app.config['MAIL_DIGEST_WINDOW'], self._release, (recipients,))
+				timer.daemon = True
+				timer.start()
+			self._pending[recipients].append(message)
+
+	def _release(self, recipients):
+		with self._pending_lock:
+			messages = self._pending.pop(recipients, None)
+		if messages:
+			with self.app.app_context():
+				self._dispatch(self._digest(messages))
+
+	def _digest(self, messages):
+		"""
+		Combine the messages held for one recipient into a single one
+		"""
+		if len(messages) == 1:
+			return messages[0]
+		html = ''.join('<h4>%s</h4>%s' % (escape(message.subject), message.html or '')
+					   for message in messages)
+		return Message(html=html, sender=messages[0].sender,
+					   subject=self.app.config['MAIL_DIGEST_SUBJECT'] % len(messages),
+					   recipients=messages[0].recipients)
+
+	def flush(self, timeout=None):
+		"""
+		Send the held digests right away, then wait until every queued
+		message has been handled, or for at most timeout seconds
+		"""
+		for recipients in list(self._pending):
+			self._release(recipients)
+		if self._queue is None or self._pid != os.getpid():
+			return
+		deadline = None if timeout is None else time.time() + timeout
+		with self._queue.all_tasks_done:
+			while self._queue.unfinished_tasks:
+				remaining = None if deadline is None else deadline - time.time()
+				if remaining is not None and remaining <= 0:
+					return
+				self._queue.all_tasks_done.wait(remaining)
+
+	def _start(self):
+		# threads do not survive a fork, so every process starts its own
+		if self._pid == os.getpid():
+			return
+		with self._lock:
+			if self._pid == os.getpid():
+				return
+			self._queue = Queue()
+			for number in range(self.app.config['MAIL_WORKERS']):
+				thread = threading.Thread(target=self._work, name='mail-%d' % number)
+				thread.daemon = True
+				thread.start()
+			self._pid = os.getpid()
+
+	def _work(self):
+		queue = self._queue
+		with self.app.app_context():
+			connection = None
+			while True:
+				try:
+					message = queue.get(timeout=self.app.config['MAIL_IDLE_TIMEOUT'])
+				except Empty:
+					connection = self._close(connection)
+					continue
+				try:
+					connection = self._deliver(connection, message)
+				finally:
+					queue.task_done()
+
+	def _deliver(self, connection, message):
+		"""
+		Send message over connection, reconnecting and backing off when it
+		fails. Return the connection to reuse for the next message.
+		"""
+		retries = self.app.config['MAIL_MAX_RETRIES']
+		for attempt in range(retries + 1):
+			try:
+				if connection is None:
+					connection = self.app.extensions['mail'].connect()
+					connection.__enter__()
+				connection.send(message)
+				return connection
+			except self.permanent_errors:
+				self.app.logger.exception('Mail to %s was refused', ', '.join(message.send_to))
+				return connection
+			except (smtplib.SMTPException, socket.error):
+				connection = self._close(connection)
+				if attempt == retries:
+					self.app.logger.exception('Giving up on mail to %s', ', '.join(message.send_to))
+					return None
+				time.sleep(self.app.config['MAIL_RETRY_BACKOFF'] * 2 ** attempt)
+			except Exception:
+				self.app.logger.exception('Could not send mail to %s', ', '.join(message.send_to))
+				return connection
+
+	def _close(self, connection):
+		if connection is not None:
+			try:
+				connection.__exit__(None, None, None)
+			except (smtplib.SMTPException, socket.error):
+				pass
+		return None
@@ -0,0 +1,175 @@
+import abc
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, exists, not_, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from .counters import recount
+from .locations import location_tree
+from .models import Item, Unit, Shelf, Container, ScheduledJob
+from .search import search_index
+from .versions import touch
+
+items = Item.__table__
+units = Unit.__table__
+shelves = Shelf.__table__
+containers = Container.__table__
+
+def _missing(column, table):
+	"""
+	column points at a row of table that does not exist
+	"""
+	return and_(column != None, not_(exists().where(table.c.id == column)))
+
+def _unit_of_shelf(shelf_id):
+	return select([shelves.c.unit_id]).where(shelves.c.id == shelf_id).as_scalar()
+
+def _shelf_has_unit(shelf_id):
+	return exists().where(and_(shelves.c.id == shelf_id, shelves.c.unit_id != None))
+
+# Every repair is one UPDATE over a whole table, run in this order
+REPAIRS = OrderedDict([
+	('shelves without their unit', lambda: shelves.update()
+		.where(_missing(shelves.c.unit_id, units)).values(unit_id=None)),
+	('items on a missing shelf', lambda: items.update()
+		.where(_missing(items.c.shelf_id, shelves)).values(shelf_id=None)),
+	('items in a missing container', lambda: items.update()
+		.where(_missing(items.c.container_id, containers)).values(container_id=None)),
+	('items that lost the unit of their shelf', lambda: items.update()
+		.where(and_(or_(items.c.unit_id == None, _missing(items.c.unit_id, units)),
+					_shelf_has_unit(items.c.shelf_id)))
+		.values(unit_id=_unit_of_shelf(items.c.shelf_id))),
+	('items on a shelf without a unit', lambda: items.update()
+		.where(and_(items.c.shelf_id != None, not_(_shelf_has_unit(items.c.shelf_id))))
+		.values(shelf_id=None)),
+	('items in a missing unit', lambda: items.update()
+		.where(_missing(items.c.unit_id, units)).values(unit_id=None)),
+	('containers on a missing shelf', lambda: containers.update()
+		.where(_missing(containers.c.shelf_id, shelves)).values(shelf_id=None)),
+	('containers that lost the unit of their shelf', lambda: containers.update()
+		.where(and_(or_(containers.c.unit_id == None, _missing(containers.c.unit_id, units)),
+					_shelf_has_unit(containers.c.shelf_id)))
+		.values(unit_id=_unit_of_shelf(containers.c.shelf_id))),
+	('containers in a missing unit', lambda: containers.update()
+		.where(_missing(containers.c.unit_id, units)).values(unit_id=None)),
+])
+
+def repair_locations(dry_run=False):
+	"""
+	Fix unit, shelf and container references that point at deleted rows or
+	disagree with each other, in one transaction. Items and containers on
+	a shelf take the shelf's unit; references that cannot be fixed are
+	cleared. Return the number of rows each repair changed.
+	"""
+	changed = OrderedDict()
+	for name, statement in REPAIRS.items():
+		changed[name] = db.session.execute(statement()).rowcount
+
+	if dry_run or not any(changed.values()):
+		db.session.rollback()
+		return changed
+
+	touch(db.session, 'items', 'shelves', 'containers')
+	# the locations of items changed behind the session's back
+	recount(db.session)
+	search_index.rebuild()
+	db.session.commit()
+	location_tree.invalidate()
+	return changed
+
+class Scheduler(abc.ABC):
+	"""
+	Run job every interval_key seconds in a background thread. Off when
+	the interval is 0.
+
+	Every process schedules the job, and the first one to find its last
+	start in scheduled_jobs at least an interval ago runs it, so workers
+	do not run it side by side.
+	"""
+	extension = None
+	interval_key = None
+
+	def __init__(self, app=None):
+		self.app = None
+		self._pid = None
+		self._lock = threading.Lock()
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.app = app
+		app.extensions[self.extension] = self
+		if app.config[self.interval_key]:
+			app.before_request(self.start)
+
+	def start(self):
+		# threads do not survive a fork, so every process starts its own
+		if self._pid == os.getpid():
+			return
+		with self._lock:
+			if self._pid == os.getpid():
+				return
+			self._pid = os.getpid()
+			self._schedule()
+
+	def _schedule(self):
+		timer = threading.Timer(self.app.config[self.interval_key], self._run)
+		timer.daemon = True
+		timer.start()
+
+	def _run(self):
+		try:
+			with self.app.app_context():
+				if self._claim():
+					self.job()
+				db.session.remove()
+		except Exception:
+			self.app.logger.exception('%s failed', type(self).__name__)
+		finally:
+			self._schedule()
+
+	def _claim(self):
+		"""
+		Record this process as starting the job now, unless another one
+		already started it within the interval. Return whether it did.
+		"""
+		jobs = ScheduledJob.__table__
+		now = datetime.utcnow()
+		due = now - timedelta(seconds=self.app.config[self.interval_key])
+		claimed = db.session.execute(jobs.update()
+									 .where(jobs.c.name == self.extension)
+									 .where(or_(jobs.c.started_at.is_(None), jobs.c.started_at <= due))
+									 .values(started_at=now)).rowcount
+		if not claimed and db.session.query(ScheduledJob.name).filter_by(name=self.extension).first() is None:
+			try:
+				db.session.execute(jobs.insert().values(name=self.extension, started_at=now))
+				claimed = 1
+			except IntegrityError:
+				# another process ran it for the first time just now
+				db.session.rollback()
+				return False
+		db.session.commit()
+		return bool(claimed)
+
+	@abc.abstractmethod
+	def job(self):
+		"""
+		The work to do, in an app context
+		"""
+
+class RepairScheduler(Scheduler):
+	"""
+	Run repair_locations every REPAIR_INTERVAL seconds
+	"""
+	extension = 'repair_scheduler'
+	interval_key = 'REPAIR_INTERVAL'
+
+	def job(self):
+		changed = repair_locations()
+		if any(changed.values()):
+			self.app.logger.info('Repaired locations: %s', ', '.join(
+				'%d %s' % (count, name) for name, count in changed.items() if count))
@@ -1,7 +1,11 @@
+import sqlite3
+
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
-from app import db, login_manager
+from app import db, login_manager, passwords
+from .users import user_cache
 
 class Brother(UserMixin, db.Model):
 	"""
@@ -20,7 +24,8 @@ class Brother(UserMixin, db.Model):
 	password_hash = db.Column(db.String(128))
 	is_admin = db.Column(db.Boolean)
 	email_confirmed = db.Column(db.Boolean)
-	reservations = db.relationship('Reservation', backref='brother', lazy='dynamic')
+	reservations = db.relationship('Reservation', backref='brother', lazy='dynamic',
+								   cascade='all, delete-orphan', passive_deletes=True)
 
 	@property
 	def password(self):
@@ -34,13 +39,18 @@ class Brother(UserMixin, db.Model):
 		"""
 		Set password to a hashed password
 		"""
-		self.password_hash = generate_password_hash(password)
+		self.password_hash = passwords.hash(password)
 
 	def verify_password(self, password):
 		"""
-		Check if hashed password matches actual password
+		Check if hashed password matches actual password, and upgrade a
+		hash made with older hasher settings while the password is known
 		"""
-		return check_password_hash(self.password_hash, password)
+		if not passwords.verify(self.password_hash, password):
+			return False
+		if passwords.needs_rehash(self.password_hash):
+			self.password_hash = passwords.hash(password)
+		return True
 
 	def __repr__(self):
 		return '<Brother: {}>'.format(self.first_name)
@@ -48,7 +58,7 @@ class Brother(UserMixin, db.Model):
 # Set up user_loader
 @login_manager.user_loader
 def load_user(user_id):
-	return Brother.query.get(int(user_id))
+	return user_cache.get(Brother, int(user_id))
 
 class Item(db.Model):
 	"""
@@ -61,10 +71,20 @@ class Item(db.Model):
 	name = db.Column(db.String(60), unique=True)
 	description = db.Column(db.String(200))
 	quantity = db.Column(db.Integer)
-	unit_id = db.Column(db.Integer, db.ForeignKey('storage_units.id'))
-	shelf_id = db.Column(db.Integer, db.ForeignKey('shelves.id'))
-	container_id = db.Column(db.Integer, db.ForeignKey('containers.id'))
-	reservations = db.relationship('Reservation', backref='item', lazy='dynamic')
+	unit_id = db.Column(db.Integer, db.ForeignKey('storage_units.id', ondelete='SET NULL'), index=True)
+	shelf_id = db.Column(db.Integer, db.ForeignKey('shelves.id', ondelete='SET NULL'), index=True)
+	container_id = db.Column(db.Integer, db.ForeignKey('containers.id', ondelete='SET NULL'), index=True)
+	# kept up to date by app.counters
+	reservation_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+	reservations = db.relationship('Reservation', backref='item', lazy='dynamic', passive_deletes=True)
+
+	@property
+	def stock(self):
+		"""
+		How many of the item can be reserved at once, items without a
+		quantity are single ones and items with none cannot be reserved
+		"""
+		return 1 if self.quantity is None else self.quantity
 
 	def __repr__(self):
 		return '<Item: {}>'.format(self.name)
@@ -75,19 +95,46 @@ class Reservation(db.Model):
 	"""
 
 	__tablename__ = 'reservations'
+	__table_args__ = (
+		# serves both per item lookups and date range overlap checks
+		db.Index('ix_reservations_item_dates', 'item_id', 'fromDate', 'toDate'),
+	)
 
 	id = db.Column(db.Integer, primary_key=True)
 	reason = db.Column(db.String(200))
+	fromDate = db.Column(db.Date, index=True)
+	toDate = db.Column(db.Date, index=True)
+	reserved_by = db.Column(db.String(20))
+	item_name = db.Column(db.String(60), index=True)
+	approved = db.Column(db.Boolean, default=False, index=True)
+	brother_id = db.Column(db.Integer, db.ForeignKey('brothers.id', ondelete='CASCADE'))
+	item_id = db.Column(db.Integer, db.ForeignKey('items.id', ondelete='SET NULL'))
+
+	def __repr__(self):
+		return '<Reservation: {}>'.format(self.reason)
+
+class ArchivedReservation(db.Model):
+	"""
+	Create a table for reservations that ended long ago, moved out of
+	reservations by app.archive
+	"""
+
+	__tablename__ = 'reservations_archive'
+
+	# the id the reservation had before it was archived
+	id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+	reason = db.Column(db.String(200))
 	fromDate = db.Column(db.Date)
-	toDate = db.Column(db.Date)
+	toDate = db.Column(db.Date, index=True)
 	reserved_by = db.Column(db.String(20))
-	item_name = db.Column(db.String(60))
+	item_name = db.Column(db.String(60), index=True)
 	approved = db.Column(db.Boolean, default=False)
-	brother_id = db.Column(db.Integer, db.ForeignKey('brothers.id'))
-	item_id = db.Column(db.Integer, db.ForeignKey('items.id'))
+	brother_id = db.Column(db.Integer, db.ForeignKey('brothers.id', ondelete='CASCADE'), index=True)
+	item_id = db.Column(db.Integer, db.ForeignKey('items.id', ondelete='SET NULL'), index=True)
+	archived_at = db.Column(db.DateTime)
 
 	def __repr__(self):
-		return '<Reservation: {}>'.format(self.reason)
+		return '<ArchivedReservation: {}>'.format(self.reason)
 
 class Unit(db.Model):
 	"""
@@ -97,11 +144,14 @@ class Unit(db.Model):
 	__tablename__ = 'storage_units'
 
 	id = db.Column(db.Integer, primary_key=True)
-	name = db.Column(db.String(60))
+	name = db.Column(db.String(60), index=True)
 	location = db.Column(db.String(60))
-	shelves = db.relationship('Shelf', backref='unit', lazy='dynamic')
-	items = db.relationship('Item', backref='unit', lazy='dynamic')
-	units = db.relationship('Container', backref='unit', lazy='dynamic')
+	# kept up to date by app.counters
+	item_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+	shelf_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+	shelves = db.relationship('Shelf', backref='unit', lazy='dynamic', passive_deletes=True)
+	items = db.relationship('Item', backref='unit', lazy='dynamic', passive_deletes=True)
+	units = db.relationship('Container', backref='unit', lazy='dynamic', passive_deletes=True)
 
 	def __repr__(self):
 		return '<Unit: {}>'.format(self.name)
@@ -115,9 +165,11 @@ class Shelf(db.Model):
 
 	id = db.Column(db.Integer, primary_key=True)
 	name = db.Column(db.String(20))
-	unit_id = db.Column(db.Integer, db.ForeignKey('storage_units.id'))
-	items = db.relationship('Item', backref='shelf', lazy='dynamic')
-	units = db.relationship('Container', backref='shelf', lazy='dynamic')
+	unit_id = db.Column(db.Integer, db.ForeignKey('storage_units.id', ondelete='SET NULL'), index=True)
+	# kept up to date by app.counters
+	item_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+	items = db.relationship('Item', backref='shelf', lazy='dynamic', passive_deletes=True)
+	units = db.relationship('Container', backref='shelf', lazy='dynamic', passive_deletes=True)
 	
 	def __repr__(self):
 		return '<Shelf: {}>'.format(self.name)
@@ -127,12 +179,54 @@ class Container(db.Model):
 	__tablename__ = 'containers'
 
 	id = db.Column(db.Integer, primary_key=True)
-	name = db.Column(db.String(20))
-	unit_id = db.Column(db.Integer, db.ForeignKey('storage_units.id'))
-	shelf_id = db.Column(db.Integer, db.ForeignKey('shelves.id'))
-	items = db.relationship('Item', backref='container', lazy='dynamic')
+	name = db.Column(db.String(20), index=True)
+	unit_id = db.Column(db.Integer, db.ForeignKey('storage_units.id', ondelete='SET NULL'))
+	shelf_id = db.Column(db.Integer, db.ForeignKey('shelves.id', ondelete='SET NULL'))
+	# kept up to date by app.counters
+	item_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+	items = db.relationship('Item', backref='container', lazy='dynamic', passive_deletes=True)
 
 	def __repr__(self):
 		return 'Container: {}'.format(self.name)
 
 
+
+class TableVersion(db.Model):
+	"""
+	Create a Table Versions table, counting the commits that changed each
+	table
+	"""
+
+	__tablename__ = 'table_versions'
+
+	name = db.Column(db.String(60), primary_key=True)
+	version = db.Column(db.Integer, nullable=False, default=0)
+	updated_at = db.Column(db.DateTime)
+
+	def __repr__(self):
+		return '<TableVersion: {} {}>'.format(self.name, self.version)
+
+class ScheduledJob(db.Model):
+	"""
+	Create a Scheduled Jobs table, with the time any process last started
+	each background job of app.maintenance
+	"""
+
+	__tablename__ = 'scheduled_jobs'
+
+	name = db.Column(db.String(60), primary_key=True)
+	started_at = db.Column(db.DateTime)
+
+	def __repr__(self):
+		return '<ScheduledJob: {} {}>'.format(self.name, self.started_at)
+
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(connection, record):
+	"""
+	SQLite only enforces foreign keys and their ON DELETE rules when asked
+	to, once per connection
+	"""
+	if isinstance(connection, sqlite3.Connection):
+		cursor = connection.cursor()
+		cursor.execute('PRAGMA foreign_keys=ON')
+		cursor.close()
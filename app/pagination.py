@@ -0,0 +1,169 @@
+import base64
+import json
+from datetime import date, datetime
+
+from flask import abort, current_app, request, url_for
+from sqlalchemy import and_, literal, or_
+
+class SortKey(object):
+	"""
+	A column a list view can be sorted on.
+
+	attr is the attribute read from each row to build the cursor, kind is
+	used to decode the cursor value back into something the column can be
+	compared against ('str', 'int', 'date' or 'bool').
+	"""
+	def __init__(self, attr, column, kind='str'):
+		self.attr = attr
+		self.column = column
+		self.kind = kind
+
+	def decode(self, value):
+		"""
+		Raise ValueError or TypeError when value cannot be a value of the
+		column, for cursors of another sort or made up ones
+		"""
+		if value is None:
+			return None
+		if self.kind == 'date':
+			return datetime.strptime(value, '%Y-%m-%d').date()
+		if self.kind == 'int':
+			return int(value)
+		if self.kind == 'bool':
+			if not isinstance(value, bool):
+				raise TypeError('not a boolean: %r' % (value,))
+			return value
+		if not isinstance(value, str):
+			raise TypeError('not a string: %r' % (value,))
+		return value
+
+	def encode(self, value):
+		if isinstance(value, date):
+			return value.isoformat()
+		return value
+
+def _encode_cursor(value, ident):
+	raw = json.dumps([value, ident]).encode('utf-8')
+	return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+	padding = '=' * (-len(cursor) % 4)
+	try:
+		value, ident = json.loads(base64.urlsafe_b64decode(str(cursor + padding)).decode('utf-8'))
+		return value, int(ident)
+	except (ValueError, TypeError):
+		abort(400)
+
+def _seek(column, id_column, value, ident, descending):
+	"""
+	Filter for the rows that come after (value, ident) in the given order.
+
+	NULL sort values are assumed to sort first in ascending order and last
+	in descending order, which is what SQLite and MySQL do.
+	"""
+	if value is not None:
+		# booleans can only be compared through a bound parameter
+		value = literal(value, column.type)
+	if not descending:
+		if value is None:
+			return or_(column.isnot(None), and_(column.is_(None), id_column > ident))
+		return or_(column > value, and_(column == value, id_column > ident))
+	if value is None:
+		return and_(column.is_(None), id_column < ident)
+	return or_(column < value, column.is_(None), and_(column == value, id_column < ident))
+
+class KeysetPage(object):
+	"""
+	One page of a keyset paginated list view
+	"""
+	def __init__(self, items, sort, descending, has_prev, has_next, prev_cursor, next_cursor):
+		self.items = items
+		self.sort = sort
+		self.descending = descending
+		self.has_prev = has_prev
+		self.has_next = has_next
+		self.prev_cursor = prev_cursor
+		self.next_cursor = next_cursor
+
+	def _url(self, **args):
+		params = request.args.to_dict()
+		params.pop('after', None)
+		params.pop('before', None)
+		params.update(args)
+		params.update(request.view_args or {})
+		return url_for(request.endpoint, **params)
+
+	@property
+	def prev_url(self):
+		return self._url(before=self.prev_cursor)
+
+	@property
+	def next_url(self):
+		return self._url(after=self.next_cursor)
+
+	def sort_url(self, sort):
+		"""
+		Link to the first page sorted on sort, flipping the direction when
+		the list is already sorted on it
+		"""
+		descending = sort == self.sort and not self.descending
+		return self._url(sort=sort, dir='desc' if descending else 'asc')
+
+def paginate(query, sort_keys, id_column, default_sort):
+	"""
+	Return a KeysetPage of query read from the request arguments.
+
+	Pages are selected with a (sort value, id) cursor instead of an offset,
+	so fetching a page costs the same wherever it is in the list.
+	sort_keys maps the names accepted in ?sort= to SortKeys.
+	"""
+	sort = request.args.get('sort', default_sort)
+	if sort not in sort_keys:
+		sort = default_sort
+	key = sort_keys[sort]
+	descending = request.args.get('dir') == 'desc'
+
+	per_page = request.args.get('per_page', current_app.config['PAGE_SIZE'], type=int)
+	per_page = max(1, min(per_page, current_app.config['MAX_PAGE_SIZE']))
+
+	after = request.args.get('after')
+	before = request.args.get('before')
+
+	# walking backwards fetches the previous page in reverse order
+	backwards = before is not None and after is None
+	reverse = descending != backwards
+
+	if backwards:
+		value, ident = _decode_cursor(before)
+	elif after is not None:
+		value, ident = _decode_cursor(after)
+
+	if after is not None or backwards:
+		try:
+			value = key.decode(value)
+		except (ValueError, TypeError):
+			abort(400)
+		query = query.filter(_seek(key.column, id_column, value, ident, reverse))
+
+	if reverse:
+		query = query.order_by(key.column.desc(), id_column.desc())
+	else:
+		query = query.order_by(key.column.asc(), id_column.asc())
+
+	rows = query.limit(per_page + 1).all()
+	more = len(rows) > per_page
+	rows = rows[:per_page]
+
+	if backwards:
+		rows.reverse()
+		has_prev, has_next = more, True
+	else:
+		has_prev, has_next = after is not None, more
+
+	def cursor(row):
+		return _encode_cursor(key.encode(getattr(row, key.attr)), row.id)
+
+	prev_cursor = cursor(rows[0]) if rows and has_prev else None
+	next_cursor = cursor(rows[-1]) if rows and has_next else None
+
+	return KeysetPage(rows, sort, descending, has_prev, has_next, prev_cursor, next_cursor)
@@ -0,0 +1,76 @@
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.sql.expression import UpdateBase
+
+# name of the replica in SQLALCHEMY_BINDS
+REPLICA = 'replica'
+
+def _use_replica(app):
+	if not has_request_context() or not g.get('read_replica'):
+		return False
+	if REPLICA not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+		return False
+	# read your own writes: stay on the primary for a while after writing
+	return session.get('primary_until', 0) < time.time()
+
+class RoutingSession(SignallingSession):
+	"""
+	Session that reads from the replica during the views marked read_only
+	and goes to the primary for everything else.
+
+	Flushes and Core INSERT, UPDATE and DELETE statements always use the
+	primary. Raw SQL text cannot be told apart, so read_only views must
+	not write with it.
+	"""
+	def get_bind(self, mapper=None, clause=None):
+		if self._flushing or isinstance(clause, UpdateBase):
+			self.info['wrote'] = True
+		elif _use_replica(self.app):
+			return get_state(self.app).db.get_engine(self.app, bind=REPLICA)
+		return SignallingSession.get_bind(self, mapper, clause)
+
+class RoutingSQLAlchemy(SQLAlchemy):
+	def create_session(self, options):
+		return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(db_session):
+	if not db_session.info.pop('wrote', False) or not has_request_context():
+		return
+	if REPLICA in (current_app.config.get('SQLALCHEMY_BINDS') or {}):
+		session['primary_until'] = time.time() + current_app.config['REPLICA_LAG']
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def _forget_write(db_session, previous_transaction):
+	db_session.info.pop('wrote', None)
+
+def read_only(view):
+	"""
+	Send the reads of GET requests to this view to the replica
+	"""
+	@wraps(view)
+	def wrapper(*args, **kwargs):
+		if request.method == 'GET':
+			g.read_replica = True
+		return view(*args, **kwargs)
+	return wrapper
+
+@contextmanager
+def primary():
+	"""
+	Read from the primary inside a read_only view, for data that is
+	cached beyond the request
+	"""
+	previous = g.get('read_replica') if has_request_context() else None
+	if previous:
+		g.read_replica = False
+	try:
+		yield
+	finally:
+		if previous:
+			g.read_replica = previous
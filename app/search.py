@@ -0,0 +1,267 @@
+import heapq
+import re
+import threading
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app import db
+from .models import Item, Unit, Shelf, Container
+from .versions import current_versions
+
+# Text of every item as it is indexed: its name, description and the names
+# of the unit, shelf and container it is kept in
+INDEXED_ITEMS = """
+	SELECT items.id, items.name, items.description,
+		   trim(coalesce(storage_units.name, '') || ' ' || coalesce(shelves.name, '') || ' ' ||
+				coalesce(containers.name, '')) AS locations
+	FROM items
+	LEFT OUTER JOIN storage_units ON storage_units.id = items.unit_id
+	LEFT OUTER JOIN shelves ON shelves.id = items.shelf_id
+	LEFT OUTER JOIN containers ON containers.id = items.container_id
+"""
+
+INDEXED_TABLES = tuple(model.__table__.name for model in (Item, Unit, Shelf, Container))
+
+def tokenize(value):
+	return re.findall(r'\w+', (value or '').lower(), re.UNICODE)
+
+_trigram_cache = {}
+
+def trigrams(token, prefix=False):
+	"""
+	Trigrams of token padded with a space on both sides, or only in front
+	when it is the start of a word
+	"""
+	key = (token, prefix)
+	grams = _trigram_cache.get(key)
+	if grams is None:
+		padded = (' %s' if prefix else ' %s ') % token
+		grams = frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+		if len(_trigram_cache) < 100000:
+			_trigram_cache[key] = grams
+	return grams
+
+class TrigramIndex(object):
+	"""
+	In-process inverted index from character trigrams to item ids, used
+	when the database has no full text search. versions are the versions
+	of the indexed tables it was built from.
+	"""
+	def __init__(self, rows, versions=None):
+		self.versions = versions
+		self.documents = {}
+		self.postings = defaultdict(set)
+		for row in rows:
+			self.add(*row)
+
+	def add(self, id, name, description, locations):
+		self.remove(id)
+		words = tokenize(name)
+		# the words separated and surrounded by spaces
+		name = ' %s ' % ' '.join(words)
+		body = ' %s ' % ' '.join(words + tokenize(description) + tokenize(locations))
+		self.documents[id] = (name, body)
+		postings = self.postings
+		for gram in set().union(*[trigrams(token) for token in set(body.split())]):
+			postings[gram].add(id)
+
+	def remove(self, id):
+		document = self.documents.pop(id, None)
+		if document is None:
+			return
+		for gram in set().union(*[trigrams(token) for token in set(document[1].split())]):
+			self.postings[gram].discard(id)
+
+	def search(self, query, limit):
+		tokens = tokenize(query)
+		if not tokens:
+			return []
+
+		# as with fts5 every word has to match, the last one may be unfinished
+		last = len(tokens) - 1
+		needles = [(' %s' if i == last else ' %s ') % token for i, token in enumerate(tokens)]
+
+		candidates = None
+		for i, token in enumerate(tokens):
+			for gram in trigrams(token, prefix=i == last):
+				matches = self.postings.get(gram, set())
+				candidates = set(matches) if candidates is None else candidates & matches
+		if candidates is None:
+			candidates = self.documents
+
+		results = []
+		for id in candidates:
+			name, body = self.documents[id]
+			# trigrams can match in different words, so check the real text
+			if not all(needle in body for needle in needles):
+				continue
+			score = sum(3 if needle in name else 1 for needle in needles)
+			if name.startswith(' ' + tokens[0]):
+				score += 1
+			results.append((-score, name, id))
+		return [id for score, name, id in heapq.nsmallest(limit, results)]
+
+class SearchIndex(object):
+	"""
+	Full text search over items.
+
+	On SQLite with FTS5 the index is an item_search virtual table that is
+	updated in the same transaction as the rows it indexes. Otherwise a
+	TrigramIndex is built on the first search and rebuilt when any process
+	changed the indexed tables since. SEARCH_BACKEND forces 'fts5' or
+	'trigram' instead of 'auto'.
+	"""
+	def __init__(self):
+		self._backend = None
+		self._trigrams = None
+		self._lock = threading.Lock()
+
+	def backend(self, connection):
+		if self._backend is None:
+			with self._lock:
+				if self._backend is None:
+					return self._choose_backend(connection)
+		return self._backend
+
+	def _choose_backend(self, connection):
+		"""
+		Pick the backend and remember it, creating and filling item_search
+		first if needed
+		"""
+		backend = current_app.config['SEARCH_BACKEND']
+		if backend != 'trigram' and connection.dialect.name == 'sqlite':
+			if getattr(connection.connection, 'in_transaction', False):
+				# this transaction has written already, so another connection
+				# would wait for it. Build the index in it, and check again
+				# once it is over in case it was rolled back.
+				return self._create_item_search(connection)
+			with db.engine.begin() as own:
+				backend = self._create_item_search(own)
+		elif backend == 'fts5':
+			raise RuntimeError('SEARCH_BACKEND is fts5 but the database is not SQLite')
+		else:
+			backend = 'trigram'
+		self._backend = backend
+		return backend
+
+	def _create_item_search(self, connection):
+		"""
+		Make sure item_search exists and indexes every item, return the
+		backend to use
+		"""
+		exists = connection.execute(text(
+			"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'item_search'")).scalar()
+		if not exists:
+			try:
+				connection.execute(text(
+					"CREATE VIRTUAL TABLE item_search USING fts5(name, description, locations, "
+					"tokenize = 'unicode61 remove_diacritics 1', prefix = '2 3')"))
+			except Exception:
+				current_app.logger.warning('SQLite has no FTS5, searching with trigrams instead')
+				return 'trigram'
+		# also fills an index that was created but never filled
+		if connection.execute(text("SELECT 1 FROM item_search LIMIT 1")).scalar() is None:
+			connection.execute(text("INSERT INTO item_search (rowid, name, description, locations) " +
+									INDEXED_ITEMS))
+		return 'fts5'
+
+	def search(self, query, limit=50):
+		"""
+		Return the ids of the items best matching query, best first
+		"""
+		connection = db.session.connection()
+		if self.backend(connection) == 'fts5':
+			tokens = tokenize(query)
+			if not tokens:
+				return []
+			# every word has to match, the last one may be unfinished
+			match = ' '.join('"%s"' % token for token in tokens) + '*'
+			rows = connection.execute(text(
+				"SELECT rowid FROM item_search WHERE item_search MATCH :match "
+				"ORDER BY bm25(item_search, 10.0, 1.0, 2.0) LIMIT :limit"),
+				match=match, limit=limit)
+			return [row[0] for row in rows]
+
+		# read before the rows, so a change in between only rebuilds again
+		versions = current_versions(*INDEXED_TABLES)
+		with self._lock:
+			if self._trigrams is None or self._trigrams.versions != versions:
+				self._trigrams = TrigramIndex(connection.execute(text(INDEXED_ITEMS)), versions)
+			return self._trigrams.search(query, limit)
+
+	def reindex(self, connection, where, params=None):
+		"""
+		Reindex the items matching the SQL condition where, called with
+		the connection of the transaction that changed them
+		"""
+		params = params or {}
+		backend = self.backend(connection)
+		if backend == 'fts5':
+			connection.execute(text("DELETE FROM item_search WHERE rowid IN (SELECT items.id FROM items WHERE %s)" % where), **params)
+			connection.execute(text("INSERT INTO item_search (rowid, name, description, locations) " +
+									INDEXED_ITEMS + " WHERE " + where), **params)
+
+	def remove(self, connection, ids):
+		if self.backend(connection) == 'fts5':
+			connection.execute(text("DELETE FROM item_search WHERE rowid IN (%s)" % ','.join(str(int(id)) for id in ids)))
+
+	def rebuild(self):
+		"""
+		Reindex every item, for writes that bypassed the session
+		"""
+		connection = db.session.connection()
+		if self.backend(connection) == 'fts5':
+			connection.execute(text("DELETE FROM item_search"))
+			connection.execute(text("INSERT INTO item_search (rowid, name, description, locations) " + INDEXED_ITEMS))
+		else:
+			self._trigrams = None
+
+search_index = SearchIndex()
+
+def _ids(objects):
+	return ','.join(str(int(obj.id)) for obj in objects)
+
+@event.listens_for(Session, 'after_flush')
+def _index_flushed(session, flush_context):
+	"""
+	Keep the search index in step with the items and locations written by
+	this flush
+	"""
+	changed = defaultdict(list)
+	deleted = []
+	for obj in list(session.new) + list(session.dirty):
+		if isinstance(obj, (Item, Unit, Shelf, Container)):
+			changed[type(obj)].append(obj)
+	for obj in session.deleted:
+		if isinstance(obj, Item):
+			deleted.append(obj)
+		elif isinstance(obj, (Unit, Shelf, Container)):
+			changed[type(obj)].append(obj)
+	if not changed and not deleted:
+		return
+
+	conditions = []
+	if changed[Item]:
+		conditions.append('items.id IN (%s)' % _ids(changed[Item]))
+	if changed[Unit]:
+		conditions.append('items.unit_id IN (%s)' % _ids(changed[Unit]))
+	if changed[Shelf]:
+		conditions.append('items.shelf_id IN (%s)' % _ids(changed[Shelf]))
+	if changed[Container]:
+		conditions.append('items.container_id IN (%s)' % _ids(changed[Container]))
+	index_changes(session, conditions, [obj.id for obj in deleted])
+
+def index_changes(session, conditions, deleted_ids=()):
+	"""
+	Reindex the items matching any of the SQL conditions and drop the
+	deleted ones, as part of the session's transaction. Writes that bypass
+	the unit of work, like bulk updates, call this themselves.
+	"""
+	connection = session.connection()
+	if deleted_ids:
+		search_index.remove(connection, deleted_ids)
+	if conditions:
+		search_index.reindex(connection, ' OR '.join(conditions))
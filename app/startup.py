@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+class StartupTimer(object):
+	"""
+	Time the steps of create_app. mark(name) records the time since the
+	previous mark under name.
+	"""
+	def __init__(self):
+		self.steps = []
+		self._last = time.perf_counter()
+
+	def mark(self, name):
+		now = time.perf_counter()
+		self.steps.append((name, now - self._last))
+		self._last = now
+
+def _child(config_name, started):
+	"""
+	Run in the profiled interpreter once app is imported: create the app
+	and print how long each part took
+	"""
+	from app import create_app
+	imported = time.perf_counter()
+	app = create_app(config_name)
+	print(json.dumps({
+		'import': imported - started,
+		'create_app': time.perf_counter() - imported,
+		'steps': app.extensions['startup_timer'].steps,
+	}))
+
+def _parse_importtime(output):
+	"""
+	Return (name, cumulative seconds, parent name) for every module in the
+	output of python -X importtime
+	"""
+	entries = []
+	for line in output.splitlines():
+		if not line.startswith('import time:') or line.endswith('| imported package'):
+			continue
+		try:
+			_, cumulative, name = line[len('import time:'):].split('|')
+			cumulative = int(cumulative) / 1e6
+		except ValueError:
+			continue
+		depth = (len(name) - len(name.lstrip()) - 1) // 2
+		entries.append((depth, name.strip(), cumulative))
+
+	# children are printed before their parent, so walk backwards
+	parents = {}
+	result = []
+	for depth, name, cumulative in reversed(entries):
+		parents[depth] = name
+		result.append((name, cumulative, parents.get(depth - 1) if depth else None))
+	return result
+
+def _is_app(name):
+	return name is not None and (name == 'app' or name.startswith('app.'))
+
+def profile(config_name, root):
+	"""
+	Start a fresh interpreter that creates the app and return the time
+	spent importing each package the app imports directly and in each step
+	of create_app
+	"""
+	process = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c',
+		 'import time; started = time.perf_counter(); import app; '
+		 'from app.startup import _child; _child(%r, started)' % config_name],
+		cwd=root, env=dict(os.environ), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+		universal_newlines=True)
+	if process.returncode:
+		raise RuntimeError(process.stderr.strip().splitlines()[-1])
+	result = json.loads(process.stdout.strip().splitlines()[-1])
+
+	packages = defaultdict(float)
+	for name, cumulative, parent in _parse_importtime(process.stderr):
+		if _is_app(parent) and not _is_app(name):
+			packages[name.split('.')[0]] += cumulative
+	result['packages'] = sorted(packages.items(), key=lambda item: -item[1])
+	return result
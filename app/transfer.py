@@ -0,0 +1,287 @@
+import csv
+import io
+import json
+from datetime import date
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import bindparam, func
+
+from app import db
+from .counters import parents_of, recount
+from .locations import location_tree
+from .models import Item, Reservation, Unit, Shelf, Container
+from .search import search_index
+from .versions import touch
+
+def _units():
+	return db.session.query(Unit.id, Unit.name, Unit.location).order_by(Unit.id)
+
+def _shelves():
+	return db.session.query(Shelf.id, Shelf.name, Shelf.unit_id, Unit.name.label('unit')) \
+		.outerjoin(Unit, Shelf.unit_id == Unit.id).order_by(Shelf.id)
+
+def _containers():
+	return db.session.query(Container.id, Container.name,
+							Container.unit_id, Unit.name.label('unit'),
+							Container.shelf_id, Shelf.name.label('shelf')) \
+		.outerjoin(Unit, Container.unit_id == Unit.id) \
+		.outerjoin(Shelf, Container.shelf_id == Shelf.id).order_by(Container.id)
+
+def _items():
+	return db.session.query(Item.id, Item.name, Item.description, Item.quantity,
+							Item.unit_id, Unit.name.label('unit'),
+							Item.shelf_id, Shelf.name.label('shelf'),
+							Item.container_id, Container.name.label('container')) \
+		.outerjoin(Unit, Item.unit_id == Unit.id) \
+		.outerjoin(Shelf, Item.shelf_id == Shelf.id) \
+		.outerjoin(Container, Item.container_id == Container.id).order_by(Item.id)
+
+def _reservations():
+	return db.session.query(Reservation.id, Reservation.reason, Reservation.fromDate, Reservation.toDate,
+							Reservation.reserved_by, Reservation.item_name, Reservation.approved,
+							Reservation.brother_id, Reservation.item_id).order_by(Reservation.id)
+
+# Query of every table that can be exported. Locations are exported with
+# their names next to their ids so an items export can be imported again.
+EXPORTS = {
+	'units': _units,
+	'shelves': _shelves,
+	'containers': _containers,
+	'items': _items,
+	'reservations': _reservations,
+}
+
+FORMATS = ('csv', 'jsonl')
+
+class ImportResult(object):
+	def __init__(self):
+		self.created = 0
+		self.updated = 0
+		self.errors = []
+
+	def __repr__(self):
+		return '<ImportResult: {} created, {} updated, {} errors>'.format(self.created, self.updated, len(self.errors))
+
+def _rows(name):
+	# yield_per streams the rows instead of loading the whole table
+	return EXPORTS[name]().yield_per(current_app.config['TRANSFER_CHUNK_SIZE'])
+
+def export_csv(name):
+	"""
+	Yield the rows of the named table as CSV, a chunk of lines at a time
+	"""
+	query = EXPORTS[name]()
+	chunk_size = current_app.config['TRANSFER_CHUNK_SIZE']
+	buffer = io.StringIO()
+	writer = csv.writer(buffer)
+	writer.writerow([column['name'] for column in query.column_descriptions])
+	for count, row in enumerate(_rows(name), 1):
+		writer.writerow(row)
+		if count % chunk_size == 0:
+			yield buffer.getvalue()
+			buffer.seek(0)
+			buffer.truncate()
+	yield buffer.getvalue()
+
+def _json_value(value):
+	if isinstance(value, date):
+		return value.isoformat()
+	raise TypeError(repr(value))
+
+def export_jsonl(name):
+	"""
+	Yield the rows of the named table as JSON lines, a chunk at a time
+	"""
+	chunk_size = current_app.config['TRANSFER_CHUNK_SIZE']
+	lines = []
+	for row in _rows(name):
+		lines.append(json.dumps(dict(zip(row.keys(), row)), default=_json_value))
+		if len(lines) == chunk_size:
+			yield '\n'.join(lines) + '\n'
+			lines = []
+	if lines:
+		yield '\n'.join(lines) + '\n'
+
+def export(name, format):
+	return export_csv(name) if format == 'csv' else export_jsonl(name)
+
+def read_csv(stream):
+	"""
+	Yield (line number, row) for every row of a CSV file with a header
+	"""
+	reader = csv.DictReader(stream)
+	for row in reader:
+		yield reader.line_num, row
+
+def read_jsonl(stream):
+	"""
+	Yield (line number, row) for every line of a JSON lines file. Lines
+	that are not JSON objects give None as their row.
+	"""
+	for number, line in enumerate(stream, 1):
+		if not line.strip():
+			continue
+		try:
+			row = json.loads(line)
+		except ValueError:
+			row = None
+		yield number, row if isinstance(row, dict) else None
+
+def read(stream, format):
+	return read_csv(stream) if format == 'csv' else read_jsonl(stream)
+
+class LocationCache(object):
+	"""
+	Map unit, shelf and container names to ids, creating the ones that do
+	not exist yet. Everything is loaded with one query per table up front.
+	The ids of created shelves are kept in new_shelves until they have
+	been counted.
+	"""
+	def __init__(self):
+		self.new_shelves = []
+		self.units = dict((name, id) for id, name in db.session.query(Unit.id, Unit.name).order_by(Unit.id.desc()))
+		self.shelves = dict(((unit_id, name), id) for id, name, unit_id in
+							db.session.query(Shelf.id, Shelf.name, Shelf.unit_id).order_by(Shelf.id.desc()))
+		self.containers = dict(((unit_id, shelf_id, name), id) for id, name, unit_id, shelf_id in
+							   db.session.query(Container.id, Container.name, Container.unit_id,
+												Container.shelf_id).order_by(Container.id.desc()))
+
+	def _create(self, table, **values):
+		return db.session.execute(table.insert().values(**values)).inserted_primary_key[0]
+
+	def unit(self, name):
+		if not name:
+			return None
+		if name not in self.units:
+			self.units[name] = self._create(Unit.__table__, name=name)
+		return self.units[name]
+
+	def shelf(self, unit_id, name):
+		if not name:
+			return None
+		key = (unit_id, name)
+		if key not in self.shelves:
+			self.shelves[key] = self._create(Shelf.__table__, name=name, unit_id=unit_id)
+			self.new_shelves.append(self.shelves[key])
+		return self.shelves[key]
+
+	def container(self, unit_id, shelf_id, name):
+		if not name:
+			return None
+		key = (unit_id, shelf_id, name)
+		if key not in self.containers:
+			self.containers[key] = self._create(Container.__table__, name=name, unit_id=unit_id, shelf_id=shelf_id)
+		return self.containers[key]
+
+# longest values the columns take, looked up once instead of for every row
+LENGTHS = dict((name, column.type.length) for name, column in (
+	('name', Item.__table__.c.name),
+	('description', Item.__table__.c.description),
+	('unit', Unit.__table__.c.name),
+	('shelf', Shelf.__table__.c.name),
+	('container', Container.__table__.c.name),
+))
+
+def _text(row, name):
+	value = row.get(name)
+	if value is None:
+		return None
+	value = str(value).strip()
+	if len(value) > LENGTHS[name]:
+		raise ValueError('%s must be at most %d characters long' % (name, LENGTHS[name]))
+	return value
+
+def _item(row, locations):
+	"""
+	Turn an imported row into a mapping of item columns
+	"""
+	name = _text(row, 'name')
+	if not name:
+		raise ValueError('name is required')
+	quantity = row.get('quantity')
+	if quantity in (None, ''):
+		quantity = None
+	else:
+		try:
+			quantity = int(quantity)
+		except (TypeError, ValueError):
+			raise ValueError('quantity must be a whole number')
+
+	unit_id = locations.unit(_text(row, 'unit'))
+	shelf_id = locations.shelf(unit_id, _text(row, 'shelf'))
+	container_id = locations.container(unit_id, shelf_id, _text(row, 'container'))
+	return {
+		'name': name,
+		'description': _text(row, 'description'),
+		'quantity': quantity,
+		'unit_id': unit_id,
+		'shelf_id': shelf_id,
+		'container_id': container_id,
+	}
+
+def import_items(rows, chunk_size=None):
+	"""
+	Import items from (line number, row) pairs as given by read().
+
+	Rows name the item's unit, shelf and container, which are created when
+	they do not exist. Items are matched by name, so existing ones are
+	updated instead of added twice. Every chunk of rows is written with
+	executemany inserts and updates in its own transaction. Rows that
+	cannot be imported are skipped and reported in the result's errors.
+	"""
+	chunk_size = chunk_size or current_app.config['TRANSFER_CHUNK_SIZE']
+	items = Item.__table__
+	result = ImportResult()
+	locations = LocationCache()
+	existing = dict(db.session.query(Item.name, Item.id))
+
+	rows = iter(rows)
+	while True:
+		chunk = list(islice(rows, chunk_size))
+		if not chunk:
+			break
+
+		inserts = {}
+		updates = {}
+		for number, row in chunk:
+			if row is None:
+				result.errors.append((number, 'not a JSON object'))
+				continue
+			try:
+				item = _item(row, locations)
+			except ValueError as error:
+				result.errors.append((number, str(error)))
+				continue
+			if item['name'] in existing:
+				item['id'] = existing[item['name']]
+				updates[item['name']] = item
+			else:
+				inserts[item['name']] = item
+
+		# executemany statements, without the per row work of the ORM
+		ids = [item['id'] for item in updates.values()]
+		parents = parents_of(db.session, items, ids)
+		if inserts:
+			last_id = db.session.query(func.max(Item.id)).scalar() or 0
+			db.session.execute(items.insert(), list(inserts.values()))
+			new = db.session.query(Item.name, Item.id).filter(Item.id > last_id).all()
+			existing.update(new)
+			ids.extend(id for name, id in new)
+		if updates:
+			db.session.execute(items.update().where(items.c.id == bindparam('item_id')),
+							   [dict(item, item_id=item.pop('id')) for item in updates.values()])
+		# created shelves count in their unit's shelf_count
+		parents = parents_of(db.session, Shelf.__table__, locations.new_shelves, parents)
+		locations.new_shelves = []
+		recount(db.session, parents_of(db.session, items, ids, parents))
+		touch(db.session, 'items', 'storage_units', 'shelves', 'containers')
+		db.session.commit()
+		result.created += len(inserts)
+		result.updated += len(updates)
+
+	# bulk writes skip the session events, so reindex everything once at the end
+	search_index.rebuild()
+	db.session.commit()
+	location_tree.invalidate()
+	return result
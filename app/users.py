@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db
+
+class UserCache(object):
+	"""
+	Remember the column values of recently seen users so the user loader
+	does not query the database on every request.
+
+	At most USER_CACHE_SIZE users are kept, least recently used first out.
+	Every user is kept with the version of its table it was loaded at, and
+	is loaded again once any process changed the table, so a change of
+	permissions takes effect on the next request in every worker. Views
+	that change a user also call invalidate(), which drops it right away.
+	"""
+	def __init__(self):
+		self._users = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, model, id):
+		"""
+		Return the instance of model with the primary key id, attached to
+		the current session, or None when there is none
+		"""
+		# app.versions needs the models, which need this module
+		from .versions import current_versions
+		table = model.__table__.name
+		version = current_versions(table).get(table, (0, None))[0]
+		with self._lock:
+			entry = self._users.get(id)
+			if entry is not None:
+				if entry[0] == version:
+					self._users.move_to_end(id)
+					values = entry[1]
+				else:
+					del self._users[id]
+					entry = None
+
+		if entry is None:
+			# read after the version, so a change in between only reloads again
+			user = model.query.get(id)
+			if user is not None:
+				self._store(id, version,
+							dict((attr.key, getattr(user, attr.key)) for attr in inspect(model).column_attrs))
+			return user
+
+		# a fresh copy for every request, merged without a query
+		user = model(**values)
+		make_transient_to_detached(user)
+		return db.session.merge(user, load=False)
+
+	def _store(self, id, version, values):
+		with self._lock:
+			self._users[id] = (version, values)
+			self._users.move_to_end(id)
+			while len(self._users) > current_app.config['USER_CACHE_SIZE']:
+				self._users.popitem(last=False)
+
+	def invalidate(self, id):
+		with self._lock:
+			self._users.pop(id, None)
+
+user_cache = UserCache()
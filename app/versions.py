@@ -0,0 +1,102 @@
+import hashlib
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, request, session
+from flask_login import current_user
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import db
+from .models import TableVersion
+
+versions_table = TableVersion.__table__
+
+def touch(session, *tables):
+	"""
+	Bump the version of every named table in the session's transaction.
+	Writes that bypass the unit of work, like bulk inserts, call this
+	themselves.
+	"""
+	connection = session.connection()
+	now = datetime.utcnow()
+	for name in sorted(set(tables)):
+		updated = connection.execute(versions_table.update()
+									 .where(versions_table.c.name == name)
+									 .values(version=versions_table.c.version + 1, updated_at=now))
+		if not updated.rowcount:
+			connection.execute(versions_table.insert().values(name=name, version=1, updated_at=now))
+
+@event.listens_for(Session, 'after_flush')
+def _touch_flushed(session, flush_context):
+	tables = set(obj.__table__.name for obj in
+				 list(session.new) + list(session.dirty) + list(session.deleted)
+				 if hasattr(obj, '__table__') and not isinstance(obj, TableVersion))
+	if tables:
+		touch(session, *tables)
+
+def current_versions(*tables):
+	"""
+	Return the version and the time of the last change of every named
+	table, in one query
+	"""
+	rows = db.session.execute(select([versions_table.c.name, versions_table.c.version, versions_table.c.updated_at])
+							  .where(versions_table.c.name.in_(tables)))
+	return dict((name, (version, updated_at)) for name, version, updated_at in rows)
+
+_templates_stamp = None
+
+def templates_stamp():
+	"""
+	Newest modification time of the templates, so pages are not answered
+	from cache after a deploy changed how they look
+	"""
+	global _templates_stamp
+	if _templates_stamp is None:
+		stamp = 0
+		for root, dirs, files in os.walk(os.path.join(current_app.root_path, current_app.template_folder)):
+			for name in files:
+				stamp = max(stamp, os.path.getmtime(os.path.join(root, name)))
+		_templates_stamp = stamp
+	return _templates_stamp
+
+def conditional(*models):
+	"""
+	Answer GET requests for a page built only from the tables of models
+	with 304 Not Modified when none of them changed since the client's copy.
+
+	The ETag covers the table versions, the URL and the current user, since
+	every page greets them by name. Pages with pending flashed messages are
+	always rendered.
+	"""
+	tables = sorted(model.__table__.name for model in models)
+
+	def decorator(view):
+		@wraps(view)
+		def wrapper(*args, **kwargs):
+			if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+				return view(*args, **kwargs)
+
+			versions = current_versions(*tables)
+			key = '|'.join([request.full_path, str(current_user.get_id()), str(current_user.is_admin),
+							str(templates_stamp())] +
+						   ['%s=%s' % (name, versions.get(name, (0, None))[0]) for name in tables])
+			etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+			if request.if_none_match.contains(etag):
+				response = current_app.response_class(status=304)
+			else:
+				response = current_app.make_response(view(*args, **kwargs))
+				if response.status_code != 200:
+					return response
+			response.set_etag(etag)
+			modified = [updated_at for version, updated_at in versions.values() if updated_at]
+			if modified:
+				response.last_modified = max(modified)
+			# browsers have to ask every time, but may keep their copy
+			response.cache_control.private = True
+			response.cache_control.no_cache = True
+			return response
+		return wrapper
+	return decorator
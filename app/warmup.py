@@ -0,0 +1,56 @@
+from sqlalchemy import text
+
+from app import db
+from .availability import _numpy
+from .choices import choice_cache
+from .locations import location_tree
+from .models import Container, Item, Unit
+from .search import search_index
+
+def engines(app):
+	"""
+	The primary engine and the engine of every bind
+	"""
+	yield db.get_engine(app)
+	for bind in app.config.get('SQLALCHEMY_BINDS') or {}:
+		yield db.get_engine(app, bind=bind)
+
+def warm_caches(app):
+	"""
+	Compile every template and fill the process wide caches, so the first
+	requests do not pay for them. Run before forking, workers share what
+	was loaded.
+	"""
+	for name in app.jinja_env.list_templates():
+		app.jinja_env.get_template(name)
+
+	with app.app_context():
+		location_tree.get()
+		for model in (Item, Unit, Container):
+			choice_cache.get(model)
+		# picks the search backend and builds the index it needs
+		search_index.search('warm up')
+		db.session.commit()
+		db.session.remove()
+
+	# imported on first use otherwise, in every worker
+	_numpy()
+
+def dispose_engines(app):
+	"""
+	Close every pooled connection. Forked workers must not share the
+	connections of their parent.
+	"""
+	with app.app_context():
+		for engine in engines(app):
+			engine.dispose()
+
+def warm_connections(app):
+	"""
+	Open a connection to every database, so a worker that cannot reach
+	one fails before it takes traffic
+	"""
+	with app.app_context():
+		for engine in engines(app):
+			with engine.connect() as connection:
+				connection.execute(text('SELECT 1'))
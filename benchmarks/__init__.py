@@ -0,0 +1,21 @@
+"""
+Benchmarks for the inventory server.
+
+Seed a database with synthetic data, then time every page against it:
+
+	python -m benchmarks.seed --scale 0.1
+	python -m benchmarks.run --output before.json
+	python -m benchmarks.compare before.json after.json
+
+Logins are timed separately for each password hasher setting:
+
+	python -m benchmarks.logins pbkdf2:150000 scrypt:15
+
+Both commands use the database of the FLASK_CONFIG configuration, so
+point it at a scratch database first.
+"""
+import os
+
+def create_benchmark_app():
+	from app import create_app
+	return create_app(os.getenv('FLASK_CONFIG', 'production'))
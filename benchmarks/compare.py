@@ -0,0 +1,27 @@
+import argparse
+import json
+
+def main():
+	parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+	parser.add_argument('before')
+	parser.add_argument('after')
+	parser.add_argument('--threshold', type=float, default=1.2,
+						help='flag pages whose p50 grew by more than this factor')
+	args = parser.parse_args()
+
+	with open(args.before) as before, open(args.after) as after:
+		before, after = json.load(before)['routes'], json.load(after)['routes']
+
+	print('%-45s %10s %10s %7s %9s' % ('url', 'p50 before', 'p50 after', 'ratio', 'queries'))
+	for url in sorted(set(before) | set(after)):
+		if url not in before or url not in after:
+			print('%-45s %s' % (url, 'only before' if url in before else 'only after'))
+			continue
+		old, new = before[url], after[url]
+		ratio = new['p50_ms'] / old['p50_ms'] if old['p50_ms'] else 1.0
+		flag = '  slower' if ratio > args.threshold else ''
+		print('%-45s %10.1f %10.1f %6.2fx %4d->%-4d%s' % (url, old['p50_ms'], new['p50_ms'], ratio,
+														  old['queries'], new['queries'], flag))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,120 @@
+import argparse
+import json
+import logging
+import threading
+import time
+
+from app import db, passwords
+from app.models import Brother
+from app.users import user_cache
+from . import create_benchmark_app
+from .run import percentile
+from .seed import PASSWORD
+
+EMAIL = 'login-benchmark@example.com'
+
+# hasher:cost settings timed when none are given
+SETTINGS = ['pbkdf2:150000', 'pbkdf2:600000', 'scrypt:14', 'scrypt:15']
+
+def prepare(app, name, cost, workers, pool):
+	"""
+	Switch the app to the given hasher settings and store the benchmark
+	user's password hashed with them, so logging in does not rehash it
+	"""
+	app.config.update(PASSWORD_HASHER=name, PASSWORD_HASH_COST=cost,
+					  PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_POOL=pool)
+	passwords.shutdown()
+	with app.app_context():
+		brother = Brother.query.filter_by(email=EMAIL).first()
+		if brother is None:
+			brother = Brother(email=EMAIL, username='login-benchmark', first_name='Login',
+							  last_name='Benchmark', is_admin=False, email_confirmed=True)
+			db.session.add(brother)
+		brother.password = PASSWORD
+		db.session.commit()
+		user_cache.invalidate(brother.id)
+		db.session.remove()
+
+def log_in(app, logins, threads):
+	"""
+	Log in logins times from threads clients at once, return the seconds
+	it took and the latency of every login in milliseconds
+	"""
+	remaining = [logins]
+	lock = threading.Lock()
+	timings = []
+	failures = []
+
+	def client():
+		while True:
+			with lock:
+				if not remaining[0]:
+					return
+				remaining[0] -= 1
+			started = time.perf_counter()
+			response = app.test_client().post('/login', data={'email': EMAIL, 'password': PASSWORD})
+			elapsed = (time.perf_counter() - started) * 1000
+			with lock:
+				timings.append(elapsed)
+				if response.status_code != 302:
+					failures.append(response.status_code)
+
+	workers = [threading.Thread(target=client) for _ in range(threads)]
+	started = time.perf_counter()
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join()
+	if failures:
+		raise SystemExit('%d logins failed with %s' % (len(failures), sorted(set(failures))))
+	return time.perf_counter() - started, timings
+
+def main():
+	parser = argparse.ArgumentParser(description='Time logins for every password hasher setting.')
+	parser.add_argument('settings', nargs='*', default=SETTINGS, help='hasher:cost settings, like pbkdf2:150000')
+	parser.add_argument('--logins', '-n', type=int, default=50, help='timed logins per setting')
+	parser.add_argument('--threads', '-t', type=int, default=4, help='clients logging in at once, like worker threads')
+	parser.add_argument('--pool-workers', type=int, nargs='+', default=[0, 2], help='PASSWORD_HASH_WORKERS values to try')
+	parser.add_argument('--pool', choices=('thread', 'process'), default='thread', help='PASSWORD_HASH_POOL')
+	parser.add_argument('--output', '-o', help='also write the results as JSON to this file')
+	args = parser.parse_args()
+
+	app = create_benchmark_app()
+	app.config['WTF_CSRF_ENABLED'] = False
+	app.logger.setLevel(logging.ERROR)
+
+	results = []
+	try:
+		for setting in args.settings:
+			name, cost = setting.split(':')
+			for workers in args.pool_workers:
+				prepare(app, name, int(cost), workers, args.pool)
+				log_in(app, args.threads, args.threads)
+				seconds, timings = log_in(app, args.logins, args.threads)
+				result = {
+					'hasher': name,
+					'cost': int(cost),
+					'pool_workers': workers,
+					'logins_per_second': round(args.logins / seconds, 1),
+					'p50_ms': round(percentile(timings, 50), 1),
+					'p99_ms': round(percentile(timings, 99), 1),
+				}
+				results.append(result)
+				print('%-16s %2d pool workers %8.1f logins/s %9.1f ms p50 %9.1f ms p99' % (
+					setting, workers, result['logins_per_second'], result['p50_ms'], result['p99_ms']))
+	finally:
+		passwords.shutdown()
+		with app.app_context():
+			brother = Brother.query.filter_by(email=EMAIL).first()
+			if brother is not None:
+				db.session.delete(brother)
+				db.session.commit()
+				user_cache.invalidate(brother.id)
+
+	if args.output:
+		with open(args.output, 'w') as output:
+			json.dump({'threads': args.threads, 'logins': args.logins, 'results': results}, output, indent=2)
+		print('wrote %s' % args.output)
+
+if __name__ == '__main__':
+	main()
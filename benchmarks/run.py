@@ -0,0 +1,178 @@
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from sqlalchemy import event, func
+
+from app import db
+from app.models import Brother, Container, Item, Reservation, Shelf, Unit
+from . import create_benchmark_app
+from .seed import PASSWORD
+
+BLUEPRINTS = ('admin', 'auth', 'home')
+
+# Endpoints that change data or need a token from an email are not driven
+SKIP = ('delete', 'remove', 'grant_admin', 'revoke', 'approve', 'reset', 'logout', 'confirm_email', 'export_table')
+
+# Model whose id fills an argument, by argument name or by endpoint for a bare id
+ARGUMENTS = {'item_id': Item, 'unit_id': Unit, 'shelf_id': Shelf, 'container_id': Container}
+ENDPOINT_MODELS = (('reservation', Reservation), ('container', Container), ('shelf', Shelf),
+				   ('unit', Unit), ('item', Item), ('brother', Brother))
+
+# What object_id means for each type_code of the filtered listings
+TYPE_CODES = {
+	'list_items': {0: Shelf, 1: Unit},
+	'list_reservations': {0: Item, 1: Brother},
+	'reservation_history': {0: Item, 1: Brother},
+}
+
+QUERY_STRINGS = {'auth.search_items': 'q=table'}
+
+def percentile(values, percent):
+	values = sorted(values)
+	return values[min(len(values) - 1, int(round(percent / 100.0 * len(values) + 0.5)) - 1)]
+
+def sample_ids():
+	"""
+	An existing id of every model, the lowest one
+	"""
+	return dict((model, db.session.query(func.min(model.id)).scalar() or 1)
+				for model in (Item, Unit, Shelf, Container, Reservation, Brother))
+
+def endpoint_model(endpoint):
+	for name, model in ENDPOINT_MODELS:
+		if name in endpoint.split('.', 1)[1]:
+			return model
+
+def urls(app, ids):
+	"""
+	Yield (endpoint, url) for every GET route of the benchmarked blueprints,
+	with its arguments filled in with existing ids
+	"""
+	for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+		if 'GET' not in rule.methods or rule.endpoint.split('.', 1)[0] not in BLUEPRINTS:
+			continue
+		if any(word in rule.endpoint for word in SKIP):
+			continue
+
+		variants = [{}]
+		view = rule.endpoint.split('.', 1)[1]
+		if 'type_code' in rule.arguments:
+			variants = [{'type_code': code, 'object_id': ids[model]} for code, model in sorted(TYPE_CODES[view].items())]
+		for values in variants:
+			for argument in rule.arguments:
+				if argument in values:
+					continue
+				model = ARGUMENTS.get(argument) or endpoint_model(rule.endpoint)
+				values[argument] = ids[model]
+			url = rule.build(values, append_unknown=False)[1]
+			if rule.endpoint in QUERY_STRINGS:
+				url += '?' + QUERY_STRINGS[rule.endpoint]
+			yield rule.endpoint, url
+
+def login(app, email):
+	client = app.test_client()
+	response = client.post('/login', data={'email': email, 'password': PASSWORD})
+	if response.status_code != 302:
+		sys.exit('could not log in as %s, seed the database with benchmarks.seed first' % email)
+	return client
+
+def measure(client, url, requests, warmup, queries):
+	for _ in range(warmup):
+		client.get(url)
+
+	timings = []
+	counts = []
+	for _ in range(requests):
+		before = queries[0]
+		started = time.perf_counter()
+		response = client.get(url)
+		timings.append((time.perf_counter() - started) * 1000)
+		counts.append(queries[0] - before)
+
+	# a separate pass, tracing allocations would skew the timings
+	tracemalloc.start()
+	client.get(url)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	return {
+		'status': response.status_code,
+		'p50_ms': round(percentile(timings, 50), 2),
+		'p90_ms': round(percentile(timings, 90), 2),
+		'p99_ms': round(percentile(timings, 99), 2),
+		'max_ms': round(max(timings), 2),
+		'queries': max(counts),
+		'peak_kb': peak // 1024,
+	}
+
+def commit():
+	try:
+		return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def main():
+	parser = argparse.ArgumentParser(description='Time every page and write the results as JSON.')
+	parser.add_argument('--output', '-o', default='benchmark.json', help='file to write the results to')
+	parser.add_argument('--requests', '-n', type=int, default=20, help='timed requests per page')
+	parser.add_argument('--warmup', type=int, default=2, help='untimed requests per page first')
+	parser.add_argument('--match', help='only benchmark urls containing this')
+	parser.add_argument('--verbose', '-v', action='store_true', help='show the warnings the app logs')
+	args = parser.parse_args()
+
+	app = create_benchmark_app()
+	app.config['WTF_CSRF_ENABLED'] = False
+	if not args.verbose:
+		# repeated statement warnings would be logged on every request
+		app.logger.setLevel(logging.ERROR)
+	with app.app_context():
+		queries = [0]
+		def count(*args):
+			queries[0] += 1
+		event.listen(db.engine, 'after_cursor_execute', count)
+
+		ids = sample_ids()
+		rows = dict((model.__tablename__, db.session.query(func.count(model.id)).scalar())
+					for model in (Item, Unit, Shelf, Container, Reservation, Brother))
+		admin_email = db.session.query(Brother.email).filter(Brother.is_admin == True).order_by(Brother.id).first()
+		member_email = db.session.query(Brother.email).filter(Brother.is_admin != True).order_by(Brother.id).first()
+		db.session.remove()
+		if admin_email is None or member_email is None:
+			sys.exit('the database needs an admin and a member, seed it with benchmarks.seed first')
+
+	admin = login(app, admin_email[0])
+	member = login(app, member_email[0])
+
+	results = {}
+	for endpoint, url in urls(app, ids):
+		if args.match and args.match not in url:
+			continue
+		client = admin if endpoint.startswith('admin.') or endpoint == 'home.admin_dashboard' else member
+		result = measure(client, url, args.requests, args.warmup, queries)
+		result['endpoint'] = endpoint
+		results[url] = result
+		print('%-45s %4d %9.1f ms p50 %9.1f ms p99 %6d queries' % (url, result['status'], result['p50_ms'],
+																	result['p99_ms'], result['queries']))
+
+	report = {
+		'meta': {
+			'commit': commit(),
+			'python': platform.python_version(),
+			'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+			'rows': rows,
+			'requests': args.requests,
+		},
+		'routes': results,
+	}
+	with open(args.output, 'w') as output:
+		json.dump(report, output, indent=2, sort_keys=True)
+	print('wrote %s' % args.output)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,153 @@
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from app import db, passwords
+from app.counters import recount
+from app.locations import location_tree
+from app.models import Brother, Container, Item, Reservation, Shelf, Unit
+from app.search import search_index
+from app.versions import touch
+from . import create_benchmark_app
+
+# Rows created at scale 1
+COUNTS = {
+	'units': 50,
+	'shelves': 2000,
+	'containers': 20000,
+	'items': 200000,
+	'reservations': 1000000,
+	'brothers': 5000,
+}
+
+# Every seeded brother logs in with this password, admin@example.com is an admin
+PASSWORD = 'Benchmark1!'
+
+ADJECTIVES = ['red', 'large', 'small', 'old', 'new', 'spare', 'broken', 'folding', 'portable', 'electric',
+			  'wooden', 'plastic', 'metal', 'blue', 'heavy', 'light', 'outdoor', 'indoor', 'party', 'kitchen']
+NOUNS = ['table', 'chair', 'speaker', 'projector', 'cooler', 'grill', 'tent', 'extension cord', 'banner', 'ladder',
+		 'lamp', 'fan', 'heater', 'blender', 'microphone', 'screen', 'canopy', 'tarp', 'toolbox', 'vacuum']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Chris', 'Pat', 'Morgan', 'Casey', 'Jamie', 'Riley']
+LAST_NAMES = ['Smith', 'Jones', 'Brown', 'Garcia', 'Miller', 'Davis', 'Lopez', 'Wilson', 'Moore', 'Clark']
+REASONS = ['Rush event', 'Formal', 'Philanthropy', 'Chapter meeting', 'Intramurals', 'Alumni weekend', 'Study night']
+
+def insert(table, rows, chunk_size):
+	"""
+	Insert the rows from a generator with one executemany per chunk
+	"""
+	chunk = []
+	for row in rows:
+		chunk.append(row)
+		if len(chunk) == chunk_size:
+			db.session.execute(table.insert(), chunk)
+			db.session.commit()
+			chunk = []
+	if chunk:
+		db.session.execute(table.insert(), chunk)
+		db.session.commit()
+
+def seed(counts, chunk_size=10000, seed=0):
+	"""
+	Fill an empty database with counts rows of every table. The same seed
+	gives the same data.
+	"""
+	rng = random.Random(seed)
+	today = date.today()
+
+	insert(Unit.__table__, ({'id': id, 'name': 'Storage Room %d' % id, 'location': 'Floor %d' % (id % 4)}
+							for id in range(1, counts['units'] + 1)), chunk_size)
+
+	shelf_units = {}
+	def shelves():
+		for id in range(1, counts['shelves'] + 1):
+			shelf_units[id] = rng.randint(1, counts['units'])
+			yield {'id': id, 'name': 'Shelf %d' % id, 'unit_id': shelf_units[id]}
+	insert(Shelf.__table__, shelves(), chunk_size)
+
+	container_places = {}
+	def containers():
+		for id in range(1, counts['containers'] + 1):
+			shelf_id = rng.randint(1, counts['shelves'])
+			container_places[id] = (shelf_units[shelf_id], shelf_id)
+			yield {'id': id, 'name': 'Bin %d' % id, 'unit_id': shelf_units[shelf_id], 'shelf_id': shelf_id}
+	insert(Container.__table__, containers(), chunk_size)
+
+	item_names = {}
+	def items():
+		for id in range(1, counts['items'] + 1):
+			name = '%s %s %d' % (rng.choice(ADJECTIVES), rng.choice(NOUNS), id)
+			item_names[id] = name
+			row = {'id': id, 'name': name, 'description': 'A %s for events' % name.rsplit(' ', 1)[0],
+				   'quantity': rng.randint(1, 10), 'unit_id': None, 'shelf_id': None, 'container_id': None}
+			place = rng.random()
+			# most items sit in a container, some loose on a shelf, a few only in a unit
+			if place < 0.7:
+				row['container_id'] = rng.randint(1, counts['containers'])
+				row['unit_id'], row['shelf_id'] = container_places[row['container_id']]
+			elif place < 0.95:
+				row['shelf_id'] = rng.randint(1, counts['shelves'])
+				row['unit_id'] = shelf_units[row['shelf_id']]
+			else:
+				row['unit_id'] = rng.randint(1, counts['units'])
+			yield row
+	insert(Item.__table__, items(), chunk_size)
+
+	# hashing is slow on purpose, so every brother shares one hash
+	password_hash = passwords.hash(PASSWORD)
+	brother_names = {}
+	def brothers():
+		for id in range(1, counts['brothers'] + 1):
+			first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+			brother_names[id] = '%s %s' % (first_name, last_name)
+			email = 'admin@example.com' if id == 1 else 'member%d@example.com' % id
+			yield {'id': id, 'email': email, 'username': 'brother%d' % id, 'first_name': first_name,
+				   'last_name': last_name, 'password_hash': password_hash, 'is_admin': id == 1 or id % 100 == 0,
+				   'email_confirmed': True}
+	insert(Brother.__table__, brothers(), chunk_size)
+
+	def reservations():
+		for id in range(1, counts['reservations'] + 1):
+			item_id = rng.randint(1, counts['items'])
+			brother_id = rng.randint(1, counts['brothers'])
+			fromDate = today + timedelta(days=rng.randint(-365, 365))
+			yield {'id': id, 'reason': rng.choice(REASONS), 'fromDate': fromDate,
+				   'toDate': fromDate + timedelta(days=rng.randint(0, 7)), 'reserved_by': brother_names[brother_id][:20],
+				   'item_name': item_names[item_id], 'approved': rng.random() < 0.6,
+				   'brother_id': brother_id, 'item_id': item_id}
+	insert(Reservation.__table__, reservations(), chunk_size)
+
+	touch(db.session, *[model.__table__.name for model in (Unit, Shelf, Container, Item, Brother, Reservation)])
+	recount(db.session)
+	search_index.rebuild()
+	db.session.commit()
+	location_tree.invalidate()
+
+def main():
+	parser = argparse.ArgumentParser(description='Fill the database with synthetic inventory data.')
+	parser.add_argument('--scale', type=float, default=1.0, help='multiply the default row counts')
+	parser.add_argument('--seed', type=int, default=0, help='random seed, the same seed gives the same data')
+	parser.add_argument('--reset', action='store_true', help='drop every table first')
+	for name, count in sorted(COUNTS.items()):
+		parser.add_argument('--' + name, type=int, help='number of %s (default %d at scale 1)' % (name, count))
+	args = parser.parse_args()
+
+	counts = dict((name, getattr(args, name) or max(1, int(count * args.scale))) for name, count in COUNTS.items())
+	app = create_benchmark_app()
+	with app.app_context():
+		if args.reset:
+			db.drop_all()
+			if db.engine.dialect.name == 'sqlite':
+				# the search index is not part of the models
+				db.session.execute('DROP TABLE IF EXISTS item_search')
+		db.create_all()
+		if db.session.query(Item.id).first() is not None:
+			parser.error('the database already has items, pass --reset to replace them')
+
+		started = time.time()
+		seed(counts, seed=args.seed)
+		print('seeded %s in %.1fs' % (', '.join('%d %s' % (counts[name], name) for name in sorted(counts)),
+									  time.time() - started))
+
+if __name__ == '__main__':
+	main()
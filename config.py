@@ -14,9 +14,74 @@ class Config(object):
     MAIL_PORT = 465
     MAIL_USE_SSL = True
     MAIL_USERNAME = 'alphagammawebmaster@gmail.com'
-    MAIL_PASSWORD = os.environ['MAIL_PASSWORD']
+    # read lazily so commands that send no mail run without it
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     SECURITY_PASSWORD_SALT = 'alpha_gamma_bitch'
 
+    # Outgoing mail is sent by MAIL_WORKERS background threads, each reusing
+    # its SMTP connection until it has been idle for MAIL_IDLE_TIMEOUT seconds
+    MAIL_ASYNC = True
+    MAIL_WORKERS = 2
+    MAIL_IDLE_TIMEOUT = 30
+    MAIL_MAX_RETRIES = 3
+    MAIL_RETRY_BACKOFF = 2
+
+    # Seconds to collect approval and admin notifications for one brother
+    # into a single digest email, 0 sends each notification on its own
+    MAIL_DIGEST_WINDOW = 0
+    MAIL_DIGEST_SUBJECT = '%d updates from Alpha Gamma Inventory'
+
+    # Number of rows per page in the list views, ?per_page= is capped at MAX_PAGE_SIZE
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 500
+
+    # Item search uses SQLite FTS5 when it can and an in-process trigram
+    # index otherwise, set to 'fts5' or 'trigram' to force one
+    SEARCH_BACKEND = 'auto'
+
+    # Longest date range the availability API answers for
+    AVAILABILITY_MAX_DAYS = 731
+
+    # Most objects the bulk API accepts in one request
+    API_MAX_BATCH = 1000
+
+    # Rows per chunk when streaming exports and per transaction on import
+    TRANSFER_CHUNK_SIZE = 1000
+
+    # How many logged in users are remembered between requests
+    USER_CACHE_SIZE = 1000
+
+    # Count the SQL run per request, and warn when one statement repeats more often than this
+    SQL_INSTRUMENTATION = True
+    SQL_REPEAT_WARNING = 10
+
+    # Seconds between background runs of the location repair job, 0 turns it off
+    REPAIR_INTERVAL = 0
+
+    # Reservations that ended more than RESERVATION_ARCHIVE_DAYS ago are moved
+    # to the archive every ARCHIVE_INTERVAL seconds (0 turns it off),
+    # ARCHIVE_BATCH_SIZE of them per transaction
+    RESERVATION_ARCHIVE_DAYS = 180
+    ARCHIVE_INTERVAL = 3600
+    ARCHIVE_BATCH_SIZE = 1000
+
+    # Passwords are hashed with 'pbkdf2' (cost is iterations) or 'scrypt'
+    # (cost is log2 of N) on a pool of PASSWORD_HASH_WORKERS threads, or
+    # processes with PASSWORD_HASH_POOL = 'process'. Stored hashes made with
+    # other settings are upgraded when their owner logs in.
+    PASSWORD_HASHER = 'pbkdf2'
+    PASSWORD_HASH_COST = 150000
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_POOL = 'thread'
+
+    # GET requests to the read only views read from the database bound as
+    # 'replica' in SQLALCHEMY_BINDS, when there is one. A brother who wrote
+    # something reads from the primary for REPLICA_LAG seconds after that.
+    REPLICA_LAG = 5
+
+    # Most rendered {% cache %} fragments kept per process, 0 turns it off
+    FRAGMENT_CACHE_SIZE = 5000
+
 class DevelopmentConfig(Config):
     """
     Development configurations
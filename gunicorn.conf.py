@@ -0,0 +1,59 @@
+# gunicorn.conf.py
+#
+# Production server settings, used by run_production:
+#
+#	gunicorn -c gunicorn.conf.py run:app
+#
+# The app is created once in the master and its caches are warmed there,
+# then the workers are forked from it. Every setting can be overridden from
+# the environment.
+#
+# Reloading without dropping requests:
+#	kill -HUP <master pid>	starts new workers and stops the old ones once
+#							they have finished their requests. The app is
+#							preloaded, so this picks up configuration
+#							changes but not new code.
+#	kill -USR2 <master pid>	starts a new master with the new code next to
+#							the old one. Once it is up, send WINCH and then
+#							QUIT to the old master.
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:%s' % os.getenv('PORT', '8000'))
+
+# Processes, each with a pool of threads serving requests
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+
+# Create the app once in the master instead of in every worker
+preload_app = True
+
+# Seconds a request may take, and a stopping worker gets to finish its requests
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# Replace workers now and then, spread out so they do not restart at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+def _app(server):
+	# run:app, as loaded by the master
+	return server.app.wsgi()
+
+def when_ready(server):
+	from app.warmup import dispose_engines, warm_caches
+	app = _app(server)
+	warm_caches(app)
+	# the workers open their own connections after the fork
+	dispose_engines(app)
+	server.log.info('Caches warmed')
+
+def post_worker_init(worker):
+	from app.warmup import warm_connections
+	warm_connections(worker.app.wsgi())
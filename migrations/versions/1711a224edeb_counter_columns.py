@@ -0,0 +1,56 @@
+"""counter columns
+
+Columns of app.counters with the number of items, shelves and
+reservations pointing at each row, filled in like flask inventory
+recount does, and indexes on the foreign keys they are counted by.
+
+Revision ID: 1711a224edeb
+Revises: ec1b19afb7d2
+Create Date: 2026-10-18 20:31:33.460371
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+
+# revision identifiers, used by Alembic.
+revision = '1711a224edeb'
+down_revision = 'ec1b19afb7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('storage_units', sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('storage_units', sa.Column('shelf_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('shelves', sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('containers', sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('items', sa.Column('reservation_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_index(op.f('ix_items_unit_id'), 'items', ['unit_id'], unique=False)
+    op.create_index(op.f('ix_items_shelf_id'), 'items', ['shelf_id'], unique=False)
+    op.create_index(op.f('ix_items_container_id'), 'items', ['container_id'], unique=False)
+    op.create_index(op.f('ix_shelves_unit_id'), 'shelves', ['unit_id'], unique=False)
+
+    from app.counters import recount
+    session = Session(bind=op.get_bind())
+    recount(session)
+    session.close()
+
+
+def downgrade():
+    op.drop_index(op.f('ix_shelves_unit_id'), table_name='shelves')
+    op.drop_index(op.f('ix_items_container_id'), table_name='items')
+    op.drop_index(op.f('ix_items_shelf_id'), table_name='items')
+    op.drop_index(op.f('ix_items_unit_id'), table_name='items')
+
+    with op.batch_alter_table('items') as batch_op:
+        batch_op.drop_column('reservation_count')
+    with op.batch_alter_table('containers') as batch_op:
+        batch_op.drop_column('item_count')
+    with op.batch_alter_table('shelves') as batch_op:
+        batch_op.drop_column('item_count')
+    with op.batch_alter_table('storage_units') as batch_op:
+        batch_op.drop_column('shelf_count')
+        batch_op.drop_column('item_count')
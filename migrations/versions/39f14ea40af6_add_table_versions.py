@@ -0,0 +1,29 @@
+"""add table_versions
+
+Revision ID: 39f14ea40af6
+Revises: 62d424bfffff
+Create Date: 2026-10-18 20:30:21.073303
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '39f14ea40af6'
+down_revision = '62d424bfffff'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('table_versions',
+    sa.Column('name', sa.String(length=60), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('table_versions')
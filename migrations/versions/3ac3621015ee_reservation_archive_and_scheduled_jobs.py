@@ -0,0 +1,62 @@
+"""reservation archive and scheduled jobs
+
+reservations_archive holds the reservations app.archive moves out of
+reservations, scheduled_jobs lets one process at a time run a job of
+app.maintenance.
+
+Revision ID: 3ac3621015ee
+Revises: 1711a224edeb
+Create Date: 2026-10-18 20:32:35.671567
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3ac3621015ee'
+down_revision = '1711a224edeb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reservations_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('reason', sa.String(length=200), nullable=True),
+    sa.Column('fromDate', sa.Date(), nullable=True),
+    sa.Column('toDate', sa.Date(), nullable=True),
+    sa.Column('reserved_by', sa.String(length=20), nullable=True),
+    sa.Column('item_name', sa.String(length=60), nullable=True),
+    sa.Column('approved', sa.Boolean(), nullable=True),
+    sa.Column('brother_id', sa.Integer(), nullable=True),
+    sa.Column('item_id', sa.Integer(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['brother_id'], ['brothers.id'], name='fk_reservations_archive_brother_id_brothers',
+                            ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], name='fk_reservations_archive_item_id_items',
+                            ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reservations_archive_brother_id'), 'reservations_archive', ['brother_id'], unique=False)
+    op.create_index(op.f('ix_reservations_archive_item_id'), 'reservations_archive', ['item_id'], unique=False)
+    op.create_index(op.f('ix_reservations_archive_item_name'), 'reservations_archive', ['item_name'], unique=False)
+    op.create_index(op.f('ix_reservations_archive_toDate'), 'reservations_archive', ['toDate'], unique=False)
+    op.create_index(op.f('ix_reservations_toDate'), 'reservations', ['toDate'], unique=False)
+
+    op.create_table('scheduled_jobs',
+    sa.Column('name', sa.String(length=60), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('scheduled_jobs')
+
+    op.drop_index(op.f('ix_reservations_toDate'), table_name='reservations')
+    op.drop_index(op.f('ix_reservations_archive_toDate'), table_name='reservations_archive')
+    op.drop_index(op.f('ix_reservations_archive_item_name'), table_name='reservations_archive')
+    op.drop_index(op.f('ix_reservations_archive_item_id'), table_name='reservations_archive')
+    op.drop_index(op.f('ix_reservations_archive_brother_id'), table_name='reservations_archive')
+    op.drop_table('reservations_archive')
@@ -0,0 +1,100 @@
+"""initial schema
+
+The tables as they were before migrations were kept. Databases made
+before then are brought under migrations with flask db stamp 62d424bfffff.
+
+Revision ID: 62d424bfffff
+Revises: 
+Create Date: 2026-10-18 20:30:18.340221
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '62d424bfffff'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('brothers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=60), nullable=True),
+    sa.Column('username', sa.String(length=60), nullable=True),
+    sa.Column('first_name', sa.String(length=60), nullable=True),
+    sa.Column('last_name', sa.String(length=60), nullable=True),
+    sa.Column('password_hash', sa.String(length=128), nullable=True),
+    sa.Column('is_admin', sa.Boolean(), nullable=True),
+    sa.Column('email_confirmed', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_brothers_email'), 'brothers', ['email'], unique=True)
+    op.create_index(op.f('ix_brothers_first_name'), 'brothers', ['first_name'], unique=False)
+    op.create_index(op.f('ix_brothers_last_name'), 'brothers', ['last_name'], unique=False)
+    op.create_index(op.f('ix_brothers_username'), 'brothers', ['username'], unique=True)
+    op.create_table('storage_units',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=60), nullable=True),
+    sa.Column('location', sa.String(length=60), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('shelves',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=20), nullable=True),
+    sa.Column('unit_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['unit_id'], ['storage_units.id'], name='fk_shelves_unit_id_storage_units'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('containers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=20), nullable=True),
+    sa.Column('unit_id', sa.Integer(), nullable=True),
+    sa.Column('shelf_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['shelf_id'], ['shelves.id'], name='fk_containers_shelf_id_shelves'),
+    sa.ForeignKeyConstraint(['unit_id'], ['storage_units.id'], name='fk_containers_unit_id_storage_units'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=60), nullable=True),
+    sa.Column('description', sa.String(length=200), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=True),
+    sa.Column('unit_id', sa.Integer(), nullable=True),
+    sa.Column('shelf_id', sa.Integer(), nullable=True),
+    sa.Column('container_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['container_id'], ['containers.id'], name='fk_items_container_id_containers'),
+    sa.ForeignKeyConstraint(['shelf_id'], ['shelves.id'], name='fk_items_shelf_id_shelves'),
+    sa.ForeignKeyConstraint(['unit_id'], ['storage_units.id'], name='fk_items_unit_id_storage_units'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name', name='uq_items_name')
+    )
+    op.create_table('reservations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('reason', sa.String(length=200), nullable=True),
+    sa.Column('fromDate', sa.Date(), nullable=True),
+    sa.Column('toDate', sa.Date(), nullable=True),
+    sa.Column('reserved_by', sa.String(length=20), nullable=True),
+    sa.Column('item_name', sa.String(length=60), nullable=True),
+    sa.Column('approved', sa.Boolean(), nullable=True),
+    sa.Column('brother_id', sa.Integer(), nullable=True),
+    sa.Column('item_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['brother_id'], ['brothers.id'], name='fk_reservations_brother_id_brothers'),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], name='fk_reservations_item_id_items'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('reservations')
+    op.drop_table('items')
+    op.drop_table('containers')
+    op.drop_table('shelves')
+    op.drop_table('storage_units')
+    op.drop_index(op.f('ix_brothers_username'), table_name='brothers')
+    op.drop_index(op.f('ix_brothers_last_name'), table_name='brothers')
+    op.drop_index(op.f('ix_brothers_first_name'), table_name='brothers')
+    op.drop_index(op.f('ix_brothers_email'), table_name='brothers')
+    op.drop_table('brothers')
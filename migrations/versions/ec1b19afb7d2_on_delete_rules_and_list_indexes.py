@@ -0,0 +1,75 @@
+"""on delete rules and list indexes
+
+Foreign keys get the ON DELETE rules app.cascade relies on, and the
+columns the list views sort and filter on get indexes.
+
+Revision ID: ec1b19afb7d2
+Revises: 39f14ea40af6
+Create Date: 2026-10-18 20:30:59.048370
+
+"""
+from collections import OrderedDict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ec1b19afb7d2'
+down_revision = '39f14ea40af6'
+branch_labels = None
+depends_on = None
+
+
+# (column, referred table, ON DELETE rule) of the foreign keys of each table
+RULES = OrderedDict([
+    ('shelves', [('unit_id', 'storage_units', 'SET NULL')]),
+    ('containers', [('unit_id', 'storage_units', 'SET NULL'),
+                    ('shelf_id', 'shelves', 'SET NULL')]),
+    ('items', [('unit_id', 'storage_units', 'SET NULL'),
+               ('shelf_id', 'shelves', 'SET NULL'),
+               ('container_id', 'containers', 'SET NULL')]),
+    ('reservations', [('brother_id', 'brothers', 'CASCADE'),
+                      ('item_id', 'items', 'SET NULL')]),
+])
+
+# SQLite leaves the foreign keys of tables made by db.create_all()
+# unnamed, batch operations name them like this so they can be dropped
+naming_convention = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+
+
+def set_ondelete(rules):
+    inspector = sa.inspect(op.get_bind())
+    for table, keys in rules.items():
+        names = dict((tuple(fk['constrained_columns']), fk['name'])
+                     for fk in inspector.get_foreign_keys(table))
+        with op.batch_alter_table(table, naming_convention=naming_convention) as batch_op:
+            for column, referred, ondelete in keys:
+                name = 'fk_%s_%s_%s' % (table, column, referred)
+                batch_op.drop_constraint(names.get((column,)) or name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    set_ondelete(RULES)
+
+    op.create_index(op.f('ix_containers_name'), 'containers', ['name'], unique=False)
+    op.create_index(op.f('ix_storage_units_name'), 'storage_units', ['name'], unique=False)
+    op.create_index(op.f('ix_reservations_approved'), 'reservations', ['approved'], unique=False)
+    op.create_index(op.f('ix_reservations_fromDate'), 'reservations', ['fromDate'], unique=False)
+    op.create_index(op.f('ix_reservations_item_name'), 'reservations', ['item_name'], unique=False)
+    op.create_index('ix_reservations_item_dates', 'reservations', ['item_id', 'fromDate', 'toDate'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reservations_item_dates', table_name='reservations')
+    op.drop_index(op.f('ix_reservations_item_name'), table_name='reservations')
+    op.drop_index(op.f('ix_reservations_fromDate'), table_name='reservations')
+    op.drop_index(op.f('ix_reservations_approved'), table_name='reservations')
+    op.drop_index(op.f('ix_storage_units_name'), table_name='storage_units')
+    op.drop_index(op.f('ix_containers_name'), table_name='containers')
+
+    set_ondelete(OrderedDict((table, [(column, referred, None) for column, referred, ondelete in keys])
+                             for table, keys in RULES.items()))
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from app import create_app, db
+from app.fragments import fragment_cache
+from app.models import Brother
+
+PASSWORD = 'Passw0rd!'
+
+class AppTestCase(unittest.TestCase):
+	"""
+	An app on a fresh SQLite database with an admin and a member, and a
+	test client logged in as each
+	"""
+	def setUp(self):
+		handle, self.path = tempfile.mkstemp(suffix='.db')
+		os.close(handle)
+		self.app = create_app('production')
+		self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + self.path
+		self.app.config['WTF_CSRF_ENABLED'] = False
+		fragment_cache.clear()
+		with self.app.app_context():
+			db.create_all()
+			admin = Brother(email='admin@example.com', username='admin', first_name='Some',
+							last_name='Admin', password=PASSWORD, is_admin=True, email_confirmed=True)
+			member = Brother(email='member@example.com', username='member', first_name='Some',
+							 last_name='Member', password=PASSWORD, is_admin=False, email_confirmed=True)
+			db.session.add_all([admin, member])
+			db.session.commit()
+			self.admin_id = admin.id
+			self.member_id = member.id
+		self.admin = self.login('admin@example.com')
+		self.client = self.login('member@example.com')
+
+	def tearDown(self):
+		with self.app.app_context():
+			db.session.remove()
+			db.drop_all()
+			db.get_engine(self.app).dispose()
+		os.remove(self.path)
+
+	def login(self, email):
+		client = self.app.test_client()
+		response = client.post('/login', data={'email': email, 'password': PASSWORD})
+		self.assertEqual(response.status_code, 302)
+		return client
+
+	def add(self, *objects):
+		"""
+		Commit objects and return their ids
+		"""
+		with self.app.app_context():
+			db.session.add_all(objects)
+			db.session.commit()
+			return [obj.id for obj in objects]
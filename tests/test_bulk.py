@@ -0,0 +1,59 @@
+import unittest
+
+from app.models import Item, Unit
+from tests.base import AppTestCase
+
+class BulkErrorsTest(AppTestCase):
+	"""
+	A batch that fails is refused as a whole, with the status saying why
+	"""
+	def setUp(self):
+		super(BulkErrorsTest, self).setUp()
+		self.unit, = self.add(Unit(name='Garage'))
+		self.tent, = self.add(Item(name='Tent', unit_id=self.unit))
+
+	def send(self, client, method, name, batch, status):
+		response = client.open('/api/v1/' + name, method=method, json=batch)
+		self.assertEqual(response.status_code, status, response.data)
+		return response.get_json()
+
+	def items(self):
+		with self.app.app_context():
+			return sorted((item.name, item.unit_id) for item in Item.query)
+
+	def test_members_cannot_write(self):
+		self.send(self.client, 'POST', 'items', [{'name': 'Stove'}], 403)
+		self.send(self.client, 'PATCH', 'items', [{'id': self.tent, 'name': 'Stove'}], 403)
+		self.send(self.client, 'DELETE', 'items', [self.tent], 403)
+		self.assertEqual(self.items(), [('Tent', self.unit)])
+
+	def test_bad_batches(self):
+		for batch in ({'name': 'Stove'}, [], [{'name': 'Stove', 'colour': 'red'}], [{'description': 'no name'}],
+					  [{'name': 'Stove', 'quantity': '2'}], [{'name': 'x' * 61}]):
+			self.assertIn('error', self.send(self.admin, 'POST', 'items', batch, 400))
+		self.assertEqual(self.items(), [('Tent', self.unit)])
+
+	def test_missing_rows(self):
+		# a reference to a missing row is a bad object, a missing row to change is not found
+		error = self.send(self.admin, 'POST', 'items', [{'name': 'Stove'}, {'name': 'Rope', 'unit_id': 99}], 400)
+		self.assertIn('storage_units 99', error['error'])
+		self.send(self.admin, 'PATCH', 'items', [{'id': self.tent, 'quantity': 2}, {'id': 99, 'quantity': 2}], 404)
+		self.send(self.admin, 'DELETE', 'items', [self.tent, 99], 404)
+		self.assertEqual(self.items(), [('Tent', self.unit)])
+		with self.app.app_context():
+			self.assertIsNone(Item.query.get(self.tent).quantity)
+
+	def test_duplicate_name(self):
+		self.send(self.admin, 'POST', 'items', [{'name': 'Stove'}, {'name': 'Tent'}], 409)
+		self.assertEqual(self.items(), [('Tent', self.unit)])
+		with self.app.app_context():
+			self.assertEqual(Unit.query.get(self.unit).item_count, 1)
+
+	def test_created(self):
+		created = self.send(self.admin, 'POST', 'items', [{'name': 'Stove', 'unit_id': self.unit}], 201)
+		self.assertEqual([item['name'] for item in created['items']], ['Stove'])
+		with self.app.app_context():
+			self.assertEqual(Unit.query.get(self.unit).item_count, 2)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from datetime import date, timedelta
+
+from app import db
+from app.cascade import delete_cascade
+from app.counters import recount
+from app.models import Brother, Container, Item, Reservation, Shelf, Unit
+from tests.base import AppTestCase
+
+class DeleteCascadeTest(AppTestCase):
+	"""
+	Deleting a row does what the ON DELETE rules of the rows pointing at
+	it say, and leaves every counter right
+	"""
+	def setUp(self):
+		super(DeleteCascadeTest, self).setUp()
+		self.unit, self.other = self.add(Unit(name='Garage'), Unit(name='Attic'))
+		self.shelf, = self.add(Shelf(name='Top', unit_id=self.unit))
+		self.container, = self.add(Container(name='Bin', unit_id=self.unit, shelf_id=self.shelf))
+		self.tent, self.stove = self.add(
+			Item(name='Tent', unit_id=self.unit, shelf_id=self.shelf, container_id=self.container),
+			Item(name='Stove', unit_id=self.other))
+		self.reservations = self.add(*[
+			Reservation(reason='trip', fromDate=date.today(), toDate=date.today() + timedelta(days=1),
+						item_id=item, brother_id=brother)
+			for item, brother in ((self.tent, self.member_id), (self.tent, self.admin_id),
+								  (self.stove, self.member_id))])
+
+	def delete(self, model, ids):
+		with self.app.app_context():
+			deleted = delete_cascade(model, ids)
+			db.session.commit()
+			# nothing was left for a full recount to fix
+			self.assertEqual(recount(db.session), 0)
+			db.session.rollback()
+			return deleted
+
+	def test_unit(self):
+		self.assertEqual(self.delete(Unit, [self.unit]), 1)
+		with self.app.app_context():
+			tent = Item.query.get(self.tent)
+			self.assertIsNone(tent.unit_id)
+			self.assertEqual((tent.shelf_id, tent.container_id), (self.shelf, self.container))
+			self.assertIsNone(Shelf.query.get(self.shelf).unit_id)
+			self.assertIsNone(Container.query.get(self.container).unit_id)
+			self.assertEqual(Shelf.query.get(self.shelf).item_count, 1)
+			self.assertEqual(Unit.query.get(self.other).item_count, 1)
+
+	def test_item(self):
+		self.assertEqual(self.delete(Item, [self.tent]), 1)
+		with self.app.app_context():
+			self.assertEqual([r.item_id for r in Reservation.query.order_by(Reservation.id)],
+							 [None, None, self.stove])
+			self.assertEqual(Unit.query.get(self.unit).item_count, 0)
+			self.assertEqual(Unit.query.get(self.unit).shelf_count, 1)
+			self.assertEqual(Shelf.query.get(self.shelf).item_count, 0)
+			self.assertEqual(Container.query.get(self.container).item_count, 0)
+
+	def test_brother(self):
+		self.assertEqual(self.delete(Brother, [self.member_id]), 1)
+		with self.app.app_context():
+			self.assertEqual([r.id for r in Reservation.query], [self.reservations[1]])
+			self.assertEqual(Item.query.get(self.tent).reservation_count, 1)
+			self.assertEqual(Item.query.get(self.stove).reservation_count, 0)
+
+	def test_counts_before_delete(self):
+		with self.app.app_context():
+			unit = Unit.query.get(self.unit)
+			self.assertEqual((unit.item_count, unit.shelf_count), (1, 1))
+			self.assertEqual(Item.query.get(self.tent).reservation_count, 2)
+			self.assertEqual(recount(db.session), 0)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from datetime import date, timedelta
+
+from app.conflicts import conflicting_reservations, find_conflicts
+from app.models import Item, Reservation
+from tests.base import AppTestCase
+
+def day(offset):
+	return date.today() + timedelta(days=offset)
+
+class ConflictsTest(AppTestCase):
+	"""
+	An item can be out as many times at once as it has quantity, and no more
+	"""
+	def setUp(self):
+		super(ConflictsTest, self).setUp()
+		self.tent, self.stove, self.rope = self.add(Item(name='Tent', quantity=2), Item(name='Stove'),
+													Item(name='Rope', quantity=0))
+
+	def reserve(self, item_id, first, last, brother_id=None):
+		reservation = Reservation(reason='trip', fromDate=day(first), toDate=day(last), item_id=item_id,
+								  brother_id=brother_id or self.member_id)
+		return self.add(reservation)[0]
+
+	def conflicts(self, item_id, first, last, exclude_id=None):
+		with self.app.app_context():
+			return sorted(r.id for r in find_conflicts(Item.query.get(item_id), day(first), day(last), exclude_id))
+
+	def conflicting(self, query=None):
+		with self.app.app_context():
+			return sorted(r.id for r in conflicting_reservations(query or Reservation.query))
+
+	def test_quantity(self):
+		first = self.reserve(self.tent, 0, 3)
+		self.assertEqual(self.conflicts(self.tent, 1, 2), [])
+		second = self.reserve(self.tent, 2, 5)
+		self.assertEqual(self.conflicts(self.tent, 3, 4), [first, second])
+		self.assertEqual(self.conflicts(self.tent, 4, 6), [])
+		# moving a reservation does not clash with where it was before
+		self.assertEqual(self.conflicts(self.tent, 3, 4, exclude_id=first), [])
+
+	def test_disjoint_overlaps(self):
+		# both overlap the new booking but never each other
+		first = self.reserve(self.tent, 0, 1)
+		second = self.reserve(self.tent, 3, 4)
+		self.assertEqual(self.conflicts(self.tent, 0, 4), [])
+		third = self.reserve(self.tent, 0, 4)
+		self.assertEqual(self.conflicts(self.tent, 1, 3), [first, second, third])
+
+	def test_no_quantity(self):
+		# items without a quantity are single ones
+		self.reserve(self.stove, 0, 0)
+		self.assertEqual(self.conflicts(self.stove, 1, 1), [])
+		self.assertNotEqual(self.conflicts(self.stove, 0, 1), [])
+		with self.app.app_context():
+			self.assertEqual(Item.query.get(self.stove).stock, 1)
+			self.assertEqual(Item.query.get(self.rope).stock, 0)
+
+	def test_conflicting_reservations(self):
+		early = self.reserve(self.tent, 0, 1)
+		self.reserve(self.tent, 3, 4)
+		wide = self.reserve(self.tent, 0, 4)
+		self.assertEqual(self.conflicting(), [])
+		# only out together with the other two on day 1
+		clash = self.reserve(self.tent, 1, 2, brother_id=self.admin_id)
+		self.assertEqual(self.conflicting(), [early, wide, clash])
+		stove = [self.reserve(self.stove, 5, 6), self.reserve(self.stove, 6, 7)]
+		self.assertEqual(self.conflicting(), [early, wide, clash] + stove)
+		self.reserve(self.rope, 0, 0)
+		self.assertEqual(len(self.conflicting()), 6)
+
+		# the filters of the list view narrow the check down
+		with self.app.app_context():
+			self.assertEqual(self.conflicting(Reservation.query.filter_by(item_id=self.stove)), stove)
+			self.assertEqual(self.conflicting(Reservation.query.filter_by(brother_id=self.admin_id)), [clash])
+
+	def test_zero_quantity_rejected(self):
+		for url in ('/admin/reservation/add/%d' % self.rope, '/reservations/add/%d' % self.rope):
+			response = self.admin.post(url, data={'reason': 'trip', 'fromDate': day(0).isoformat(),
+												  'toDate': day(1).isoformat()}, follow_redirects=True)
+			self.assertIn(b'has a quantity of 0', response.data, url)
+		with self.app.app_context():
+			self.assertEqual(Reservation.query.count(), 0)
+
+if __name__ == '__main__':
+	unittest.main()
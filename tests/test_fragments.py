@@ -0,0 +1,33 @@
+import unittest
+from datetime import date, timedelta
+
+from app import db
+from app.models import Reservation
+from tests.base import AppTestCase
+
+class ReservationFragmentsTest(AppTestCase):
+	"""
+	Cached reservation rows must not outlive the reservation they show
+	"""
+	def add_reservation(self, reason):
+		reservation = Reservation(reason=reason, fromDate=date.today(),
+								  toDate=date.today() + timedelta(days=1), reserved_by='Some Member',
+								  item_name='Tent', brother_id=self.member_id)
+		return self.add(reservation)[0]
+
+	def test_deleted_then_added(self):
+		first = self.add_reservation('FIRSTREASON')
+		self.assertIn(b'FIRSTREASON', self.client.get('/reservations').data)
+		with self.app.app_context():
+			db.session.delete(Reservation.query.get(first))
+			db.session.commit()
+
+		second = self.add_reservation('SECONDREASON')
+		# SQLite reuses the id, so it alone cannot tell the rows apart
+		self.assertEqual(first, second)
+		page = self.client.get('/reservations').data
+		self.assertIn(b'SECONDREASON', page)
+		self.assertNotIn(b'FIRSTREASON', page)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,80 @@
+import base64
+import json
+import unittest
+from datetime import date, timedelta
+
+from app.listings import RESERVATION_SORTS, UNIT_SORTS
+from app.models import Reservation, Unit
+from app.pagination import paginate
+from tests.base import AppTestCase
+
+def cursor(value, ident):
+	raw = json.dumps([value, ident]).encode('utf-8')
+	return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+class PaginateTest(AppTestCase):
+	"""
+	Keyset pages cover every row once, in order, walking either way
+	"""
+	def setUp(self):
+		super(PaginateTest, self).setUp()
+		# two units share a name, so the id has to break the tie
+		self.add(*[Unit(name=name) for name in ('delta', 'alpha', 'echo', 'bravo', 'alpha', 'golf', 'charlie')])
+		today = date.today()
+		self.add(*[Reservation(reason='r%d' % i, fromDate=today + timedelta(days=i), toDate=today + timedelta(days=i),
+							   approved=bool(i % 2), brother_id=self.member_id) for i in range(5)])
+
+	def page(self, url, query, sort_keys, default_sort):
+		with self.app.test_request_context(url):
+			page = paginate(query(), sort_keys, sort_keys[default_sort].column.class_.id, default_sort)
+			rows = [(getattr(row, sort_keys[page.sort].attr), row.id) for row in page.items]
+			return (page.prev_url if page.has_prev else None), (page.next_url if page.has_next else None), rows
+
+	def walk(self, url, query, sort_keys, default_sort):
+		"""
+		Follow next_url to the end and prev_url back, return the rows of the
+		pages seen both ways
+		"""
+		forward = []
+		while url:
+			prev_url, url, rows = self.page(url, query, sort_keys, default_sort)
+			forward.append(rows)
+		backward = []
+		url = prev_url
+		while url:
+			url, _, rows = self.page(url, query, sort_keys, default_sort)
+			backward.insert(0, rows)
+		return forward, backward
+
+	def test_forward_and_back(self):
+		forward, backward = self.walk('/units?per_page=3', lambda: Unit.query, UNIT_SORTS, 'name')
+		with self.app.app_context():
+			expected = [(unit.name, unit.id) for unit in Unit.query.order_by(Unit.name, Unit.id)]
+		self.assertEqual([len(rows) for rows in forward], [3, 3, 1])
+		self.assertEqual(sum(forward, []), expected)
+		self.assertEqual(backward, forward[:-1])
+
+	def test_descending(self):
+		forward, backward = self.walk('/units?per_page=2&dir=desc', lambda: Unit.query, UNIT_SORTS, 'name')
+		with self.app.app_context():
+			expected = [(unit.name, unit.id) for unit in Unit.query.order_by(Unit.name.desc(), Unit.id.desc())]
+		self.assertEqual(sum(forward, []), expected)
+		self.assertEqual(backward, forward[:-1])
+
+	def test_boolean_sort(self):
+		forward, backward = self.walk('/reservations?per_page=2&sort=approved', lambda: Reservation.query,
+									  RESERVATION_SORTS, 'date')
+		with self.app.app_context():
+			expected = [(reservation.approved, reservation.id) for reservation in
+						Reservation.query.order_by(Reservation.approved, Reservation.id)]
+		self.assertEqual(sum(forward, []), expected)
+		self.assertEqual(backward, forward[:-1])
+
+	def test_malformed_cursors(self):
+		for url in ('/units?after=!!!', '/units?after=' + cursor(['alpha'], 1),
+					'/reservations?sort=date&after=' + cursor('alpha', 1),
+					'/reservations?sort=approved&after=' + cursor('x', 1)):
+			self.assertEqual(self.client.get(url).status_code, 400, url)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from app import db
+from app.models import Brother
+from app.versions import touch
+from tests.base import AppTestCase
+
+class UserCacheTest(AppTestCase):
+	"""
+	Cached users must follow permission changes made by any process
+	"""
+	def test_revoked_by_another_process(self):
+		self.assertEqual(self.admin.get('/admin/items').status_code, 200)
+		with self.app.app_context():
+			# as another worker would: the user cache of this process is not
+			# invalidated
+			brothers = Brother.__table__
+			db.session.execute(brothers.update().where(brothers.c.id == self.admin_id).values(is_admin=False))
+			touch(db.session, 'brothers')
+			db.session.commit()
+		self.assertEqual(self.admin.get('/admin/items').status_code, 403)
+
+	def test_removed_by_another_process(self):
+		self.assertEqual(self.client.get('/dashboard').status_code, 200)
+		with self.app.app_context():
+			db.session.execute(Brother.__table__.delete().where(Brother.__table__.c.id == self.member_id))
+			touch(db.session, 'brothers')
+			db.session.commit()
+		# logged out, sent to the login page
+		self.assertEqual(self.client.get('/dashboard').status_code, 302)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from app import db
+from app.models import Shelf, Unit
+from app.versions import touch
+from tests.base import AppTestCase
+
+class ConditionalTest(AppTestCase):
+	"""
+	Pages answered with 304 Not Modified must follow every write, also the
+	ones made by other worker processes
+	"""
+	def setUp(self):
+		super(ConditionalTest, self).setUp()
+		self.unit_id, = self.add(Unit(name='Garage'))
+		self.add(Shelf(name='Top', unit_id=self.unit_id))
+
+	def test_unchanged(self):
+		url = '/units/shelves/%d' % self.unit_id
+		etag = self.client.get(url).headers['ETag']
+		self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+	def test_written_by_another_process(self):
+		url = '/units/shelves/%d' % self.unit_id
+		etag = self.client.get(url).headers['ETag']
+		with self.app.app_context():
+			# as another worker would: the cached location tree of this
+			# process is not invalidated
+			db.session.execute(Unit.__table__.update().values(name='Shed'))
+			touch(db.session, 'storage_units')
+			db.session.commit()
+
+		response = self.client.get(url, headers={'If-None-Match': etag})
+		self.assertEqual(response.status_code, 200)
+		self.assertIn(b'Shelves in Shed', response.data)
+		self.assertNotEqual(response.headers['ETag'], etag)
+
+if __name__ == '__main__':
+	unittest.main()